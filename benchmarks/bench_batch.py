@@ -0,0 +1,34 @@
+# bench_batch.py
+"""Пропускная способность BatchSimulator (поля·шаги в секунду).
+
+Закончившиеся поля сразу сбрасываются, чтобы все N полей оставались живыми.
+Запуск из корня проекта: python -m benchmarks.bench_batch
+"""
+
+import time
+
+import numpy as np
+
+from game.batch import BatchSimulator
+
+
+def bench(n, steps):
+    sim = BatchSimulator(n, seed=0)
+    rng = np.random.default_rng(0)
+    rotations = rng.integers(0, 4, (steps, n))
+    xs = rng.integers(0, sim.width, (steps, n))
+    start = time.perf_counter()
+    for step in range(steps):
+        sim.step(rotations[step], xs[step])
+        if sim.game_over.any():
+            sim.reset(sim.game_over)
+    return n * steps / (time.perf_counter() - start)
+
+
+def main():
+    for n, steps in ((1, 5000), (100, 2000), (10_000, 100)):
+        print(f"N = {n:>6}: {bench(n, steps):>12,.0f} поле·шагов/с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+# bench_client_net.py
+"""Время сетевой части кадра клиента сражения на медленной связи.
+
+Между клиентом и сервером сражений (оба в этом процессе) стоит прокси,
+пропускающий к серверу не больше --bandwidth байт в секунду. Клиент
+--seconds секунд с частотой --fps отправляет каждый кадр состояние
+партии ИИ и читает состояние соперника, как BattleTetrisGame.game_loop.
+Сравниваются BattleClient (неблокирующий сокет в потоке ввода-вывода,
+отправляется только новейшее состояние) и прежняя схема (блокирующий
+sendall из игрового цикла). Для каждой выводятся время сетевой части
+кадра p50/p99/max, число кадров дольше бюджета кадра и сколько
+состояний ушло на сервер.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_client_net [--bandwidth 1000] [--seconds 10] [--fps 120]
+"""
+
+import argparse
+import asyncio
+import socket
+import threading
+import time
+
+from benchmarks.bench_sync import ai_frames, game_state
+from network.battle_client import BattleClient, SEND_BUFFER
+from network.battle_server import BattleServer
+from network.protocol import *
+
+PROXY_BUFFER = 4096  # Буфер приема прокси: медленная связь быстро дает обратное давление
+PROXY_CHUNK = 256
+
+
+class ThrottledProxy:
+    """TCP-прокси к серверу: от клиента к серверу не больше bandwidth байт/с."""
+
+    def __init__(self, target_port, bandwidth):
+        self.target_port = target_port
+        self.bandwidth = bandwidth
+        self.port = None
+        self.loop = None
+
+    def start(self):
+        ready = threading.Event()
+        threading.Thread(target=self.run, args=(ready,), daemon=True).start()
+        ready.wait()
+
+    def run(self, ready):
+        self.loop = asyncio.new_event_loop()
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, PROXY_BUFFER)
+        listener.bind(("127.0.0.1", 0))
+        self.port = listener.getsockname()[1]
+        server = self.loop.run_until_complete(asyncio.start_server(
+            self.handle, sock=listener, limit=PROXY_BUFFER))
+        ready.set()
+        self.loop.run_forever()
+
+    async def handle(self, client_reader, client_writer):
+        server_reader, server_writer = await asyncio.open_connection(
+            "127.0.0.1", self.target_port)
+        await asyncio.gather(
+            self.pipe(client_reader, server_writer, self.bandwidth),
+            self.pipe(server_reader, client_writer, None),
+            return_exceptions=True)
+        client_writer.close()
+        server_writer.close()
+
+    async def pipe(self, reader, writer, bandwidth):
+        while True:
+            data = await reader.read(PROXY_CHUNK)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+            if bandwidth:
+                await asyncio.sleep(len(data) / bandwidth)
+
+
+class LegacyClient:
+    """Прежний BattleClient: блокирующий sendall из игрового цикла и
+    поток приема, разделяющие кодировщик под блокировкой."""
+
+    def __init__(self, port):
+        # Тот же буфер отправки, что у BattleClient: разница только в блокировке
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER)
+        self.sock.connect(("127.0.0.1", port))
+        self.encoder = StateEncoder()
+        self.send_lock = threading.Lock()
+        self.received = (0, None)
+        self.states_sent = 0
+        threading.Thread(target=self.receive_data, daemon=True).start()
+
+    def receive_data(self):
+        try:
+            while True:
+                message = read_message(self.sock)
+                if message is None:
+                    break
+                if message[0] == MSG_ACK:
+                    with self.send_lock:
+                        self.encoder.ack(decode_ack(message[1]))
+        except OSError:
+            pass
+
+    def send_data(self, data):
+        with self.send_lock:
+            self.sock.sendall(self.encoder.encode(data))
+        self.states_sent += 1
+
+    def disconnect(self):
+        self.sock.close()
+
+
+def run_frames(client, seconds, fps):
+    """Игровой цикл без отрисовки: время сетевой части каждого кадра, мс."""
+    frame_s = 1 / fps
+    frames = int(seconds * fps)
+    times = []
+    next_frame = time.perf_counter()
+    for engine in ai_frames(1, frames):
+        state = game_state(engine)
+        start = time.perf_counter()
+        client.send_data(state)
+        version, received = client.received
+        times.append((time.perf_counter() - start) * 1000)
+        next_frame += frame_s
+        delay = next_frame - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    return times
+
+
+def report(name, times, states_sent, fps):
+    times = sorted(times)
+    budget_ms = 1000 / fps
+    slow = sum(1 for value in times if value > budget_ms)
+    print(f"{name}: кадров {len(times)}, сеть p50 {times[len(times) // 2]:.3f} мс, "
+          f"p99 {times[int(len(times) * 0.99)]:.3f} мс, max {times[-1]:.1f} мс, "
+          f"дольше {budget_ms:.1f} мс: {slow}; состояний ушло на сервер {states_sent}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сетевая часть кадра на медленной связи.")
+    parser.add_argument("--bandwidth", type=int, default=1000,
+                        help="байт в секунду от клиента к серверу")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--fps", type=int, default=120)
+    parser.add_argument("--port", type=int, default=5700)
+    args = parser.parse_args()
+
+    server = BattleServer(host="127.0.0.1", port=args.port)
+    threading.Thread(target=server.start, daemon=True).start()
+    time.sleep(0.5)
+    print(f"связь к серверу {args.bandwidth} байт/с, {args.fps} кадров/с, {args.seconds:.0f} с")
+
+    proxy = ThrottledProxy(args.port, args.bandwidth)
+    proxy.start()
+    client = BattleClient("127.0.0.1", proxy.port)
+    client.connect()
+    times = run_frames(client, args.seconds, args.fps)
+    report("BattleClient", times, client.states_sent, args.fps)
+    print(f"  заменено более новыми до отправки: {client.states_coalesced}")
+    client.disconnect()
+
+    proxy = ThrottledProxy(args.port, args.bandwidth)
+    proxy.start()
+    client = LegacyClient(proxy.port)
+    times = run_frames(client, args.seconds, args.fps)
+    report("блокирующий sendall", times, client.states_sent, args.fps)
+    client.disconnect()
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
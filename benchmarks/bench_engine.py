@@ -0,0 +1,36 @@
+# bench_engine.py
+"""Скорость безголовой симуляции TetrisEngine (без pygame).
+
+Запуск из корня проекта: python -m benchmarks.bench_engine
+"""
+
+import random
+import sys
+import time
+
+from game.engine import *
+
+
+def play_random_game(rng, dt_ms=16):
+    engine = TetrisEngine()
+    actions = (0, INPUT_LEFT, INPUT_RIGHT, INPUT_ROTATE, INPUT_HARD_DROP,
+               INPUT_HOLD, INPUT_DOWN)
+    steps = 0
+    while not engine.game_over:
+        engine.step(rng.choice(actions), dt_ms)
+        steps += 1
+    return steps
+
+
+def main(games=2000):
+    rng = random.Random(0)
+    start = time.perf_counter()
+    steps = sum(play_random_game(rng) for _ in range(games))
+    elapsed = time.perf_counter() - start
+    print(f"pygame загружен: {'pygame' in sys.modules}")
+    print(f"{games} игр, {steps} шагов за {elapsed:.2f} с: "
+          f"{games / elapsed:.0f} игр/с, {steps / elapsed:.0f} шагов/с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# bench_grid.py
+"""Сравнение Grid (список списков) и BitGrid (битовые маски строк).
+
+Запуск из корня проекта: python -m benchmarks.bench_grid
+"""
+
+import random
+import time
+
+from game.constants import GRID_WIDTH, GRID_HEIGHT, SHAPES
+from game.bitboard import shape_masks
+from game.grid import Grid, BitGrid
+
+
+def make_rotations():
+    rotations = []
+    for shape in SHAPES.values():
+        for _ in range(4):
+            rotations.append(shape)
+            shape = [list(reversed(col)) for col in zip(*shape)]
+    return rotations
+
+
+def fill_random(grid, rng, filled_rows=8):
+    rows = [[0] * GRID_WIDTH for _ in range(GRID_HEIGHT)]
+    for y in range(GRID_HEIGHT - filled_rows, GRID_HEIGHT):
+        for x in range(GRID_WIDTH):
+            rows[y][x] = 1 if rng.random() < 0.6 else 0
+    grid.grid = rows
+
+
+def bench_valid_move(grid_class, shapes, positions, repeat=5):
+    grid = grid_class(GRID_WIDTH, GRID_HEIGHT)
+    fill_random(grid, random.Random(1))
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for shape, x, y in positions:
+            grid.valid_move(shape, x, y)
+        best = min(best, time.perf_counter() - start)
+    return best / len(positions)
+
+
+def bench_valid_masks(positions, repeat=5):
+    grid = BitGrid(GRID_WIDTH, GRID_HEIGHT)
+    fill_random(grid, random.Random(1))
+    masked = [(shape_masks(shape), x, y) for shape, x, y in positions]
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for masks, x, y in masked:
+            grid.valid_masks(masks, x, y)
+        best = min(best, time.perf_counter() - start)
+    return best / len(masked)
+
+
+def bench_place_clear(grid_class, shapes, games=200):
+    rng = random.Random(2)
+    start = time.perf_counter()
+    placed = 0
+    for _ in range(games):
+        grid = grid_class(GRID_WIDTH, GRID_HEIGHT)
+        while True:
+            shape = rng.choice(shapes)
+            x = rng.randrange(GRID_WIDTH - len(shape[0]) + 1)
+            if not grid.valid_move(shape, x, 0):
+                break
+            y = 0
+            while grid.valid_move(shape, x, y + 1):
+                y += 1
+            grid.place_shape(shape, x, y)
+            grid.clear_lines()
+            placed += 1
+    return (time.perf_counter() - start) / placed
+
+
+def main():
+    shapes = make_rotations()
+    rng = random.Random(0)
+    positions = [(shape, rng.randrange(-1, GRID_WIDTH),
+                  rng.randrange(GRID_HEIGHT)) for shape in shapes
+                 for _ in range(500)]
+
+    print(f"{'операция':<28}{'Grid, мкс':>12}{'BitGrid, мкс':>14}{'ускорение':>12}")
+    results = [
+        ("valid_move", bench_valid_move(Grid, shapes, positions),
+         bench_valid_move(BitGrid, shapes, positions)),
+        ("valid_move (готовые маски)", bench_valid_move(Grid, shapes, positions),
+         bench_valid_masks(positions)),
+        ("drop + place + clear", bench_place_clear(Grid, shapes),
+         bench_place_clear(BitGrid, shapes)),
+    ]
+    for name, grid_time, bit_time in results:
+        print(f"{name:<28}{grid_time * 1e6:>12.2f}{bit_time * 1e6:>14.2f}"
+              f"{grid_time / bit_time:>11.1f}x")
+
+
+if __name__ == "__main__":
+    main()
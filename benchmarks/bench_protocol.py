@@ -0,0 +1,76 @@
+# bench_protocol.py
+"""Размер и скорость сообщения состояния: двоичный протокол против pickle.
+
+Запуск из корня проекта: python -m benchmarks.bench_protocol
+"""
+
+import pickle
+import random
+import time
+
+from game.engine import TetrisEngine, INPUT_HARD_DROP, INPUT_HOLD, INPUT_LEFT
+from network.protocol import encode_state, decode_keyframe, HEADER
+
+
+def make_states(count=200):
+    """Состояния по ходу случайной партии в старом (pickle) и новом виде."""
+    rng = random.Random(0)
+    engine = TetrisEngine(seed=1)
+    states = []
+    while len(states) < count:
+        if engine.game_over:
+            engine = TetrisEngine(seed=len(states))
+        engine.step(rng.choice((0, INPUT_LEFT, INPUT_HOLD, INPUT_HARD_DROP)), 16)
+        old = {
+            "grid": engine.grid.grid,
+            "score": engine.score,
+            "level": engine.level,
+            "held_shape": engine.held_shape,
+            "next_shapes": engine.next_shapes,
+        }
+        new = {
+            "rows": list(engine.grid.rows),
+            "score": engine.score,
+            "level": engine.level,
+            "held_shape": engine.held_shape,
+            "bag_position": engine.bag.position,
+        }
+        states.append((old, new))
+    return states
+
+
+def bench(function, items, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            function(item)
+        best = min(best, time.perf_counter() - start)
+    return len(items) / best
+
+
+def main():
+    states = make_states()
+    old_states = [old for old, _ in states]
+    new_states = [new for _, new in states]
+    pickled = [pickle.dumps(state) for state in old_states]
+    encoded = [encode_state(state, seq) for seq, state in enumerate(new_states)]
+    payloads = [message[HEADER.size:] for message in encoded]
+
+    # Старый формат: 10 байт ASCII-длины + pickle
+    old_size = sum(10 + len(data) for data in pickled) / len(pickled)
+    new_size = sum(len(data) for data in encoded) / len(encoded)
+    print(f"размер сообщения: pickle {old_size:.0f} байт, "
+          f"двоичный {new_size:.0f} байт ({old_size / new_size:.1f}x меньше)")
+    for name, old_function, new_function, old_items, new_items in (
+            ("кодирование", pickle.dumps, lambda state: encode_state(state, 1),
+             old_states, new_states),
+            ("декодирование", pickle.loads, decode_keyframe, pickled, payloads)):
+        old_rate = bench(old_function, old_items)
+        new_rate = bench(new_function, new_items)
+        print(f"{name}: pickle {old_rate:,.0f}/с, двоичный {new_rate:,.0f}/с "
+              f"({new_rate / old_rate:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
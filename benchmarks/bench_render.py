@@ -0,0 +1,251 @@
+# bench_render.py
+"""Замер отрисовки без монитора (SDL_VIDEODRIVER=dummy), результат в JSON.
+
+Для каждого состояния поля (пустое, наполовину заполненное, почти до
+верха) меряются Grid.draw, draw_shape, TetrisGame.draw_shadow,
+draw_info_window, полный кадр одиночной игры и полный кадр сражения (два
+поля, как в BattleTetrisGame.game_loop). Фигура, очки и очередь меняются
+по сценарию, поэтому частичная перерисовка работает как в игре.
+
+Для каждого замера выводятся mean/p50/p99 в миллисекундах и выделения
+за кадр: пик памяти Python (tracemalloc) и число явно созданных
+pygame.Surface. Строки шрифта и пиксели поверхностей выделяет SDL,
+tracemalloc их не видит.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_render [--frames N] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+from game.constants import *
+from game.renderer import BoardRenderer
+from game.shape import draw_shape
+from game.tetris_game import TetrisGame
+
+# Сколько нижних строк заполнено в каждом состоянии
+BOARD_STATES = {"empty": 0, "half": GRID_HEIGHT // 2, "near_topout": GRID_HEIGHT - 3}
+
+OP_X_OFFSET = 650  # Смещение поля соперника, как в BattleTetrisGame
+
+
+def fill_rows(game, filled, rng):
+    """Нижние filled строк с одной дырой в каждой и случайными пустотами."""
+    full = (1 << GRID_WIDTH) - 1
+    rows = [0] * GRID_HEIGHT
+    for y in range(GRID_HEIGHT - filled, GRID_HEIGHT):
+        row = full & ~(1 << rng.randrange(GRID_WIDTH))
+        if rng.random() < 0.3:
+            row &= ~(1 << rng.randrange(GRID_WIDTH))
+        rows[y] = row
+    game.grid.set_rows(rows)
+
+
+def make_game(filled, seed):
+    game = TetrisGame(seed=seed)
+    fill_rows(game, filled, random.Random(seed))
+    return game
+
+
+def script(game, frame):
+    """Движение фигуры и смена панели на кадре frame."""
+    if frame % 40 == 0:
+        game.current_shape = game.current_shape.rotate()
+    width = game.current_shape.width
+    game.current_x = (frame // 4) % (GRID_WIDTH - width + 1)
+    game.current_y = 0
+    game.current_y = frame % (game.landing_y() + 1)
+    if frame % 30 == 0:
+        game.score += 100
+    if frame % 60 == 0:
+        game.next_shapes = game.next_shapes[1:] + game.next_shapes[:1]
+    if frame % 120 == 0:
+        game.held_shape = game.next_shapes[0] if game.held_shape is None else None
+
+
+def script_board(game, frame):
+    """Изменение поля соперника: одна клетка каждый кадр."""
+    rows = list(game.grid.rows)
+    y = GRID_HEIGHT - 1 - frame % 3
+    rows[y] ^= 1 << (frame % GRID_WIDTH)
+    game.grid.set_rows(rows)
+
+
+def case_grid_draw(screen, filled):
+    game = make_game(filled, 1)
+    return lambda frame: game.grid.draw(screen)
+
+
+def case_draw_shape(screen, filled):
+    game = make_game(filled, 1)
+
+    def run(frame):
+        script(game, frame)
+        draw_shape(screen, game.current_shape, game.current_x, game.current_y)
+    return run
+
+
+def case_draw_shadow(screen, filled):
+    game = make_game(filled, 1)
+
+    def run(frame):
+        script(game, frame)
+        game.draw_shadow(screen)
+    return run
+
+
+def case_info_window(screen, filled):
+    game = make_game(filled, 1)
+
+    def run(frame):
+        script(game, frame)
+        game.draw_info_window(screen)
+    return run
+
+
+def case_single_frame(screen, filled):
+    game = make_game(filled, 1)
+    game.begin_frames(screen)
+
+    def run(frame):
+        script(game, frame)
+        pygame.display.update(game.draw_frame(screen))
+    return run
+
+
+def case_battle_frame(screen, filled):
+    game = make_game(filled, 1)
+    op_game = make_game(filled, 2)
+    op_renderer = BoardRenderer(x_offset=OP_X_OFFSET)
+    game.begin_frames(screen)
+
+    def run(frame):
+        script(game, frame)
+        script(op_game, frame)
+        script_board(op_game, frame)
+        rects = game.draw_frame(screen)
+        rects += op_renderer.render(screen, op_game.grid.rows)
+        rects += op_game.draw_info_window(screen, x_offset=OP_X_OFFSET)
+        pygame.display.update(rects)
+    return run
+
+
+CASES = {
+    "grid_draw": case_grid_draw,
+    "draw_shape": case_draw_shape,
+    "draw_shadow": case_draw_shadow,
+    "info_window": case_info_window,
+    "single_frame": case_single_frame,
+    "battle_frame": case_battle_frame,
+}
+
+
+class CountingSurface(pygame.Surface):
+    """pygame.Surface, считающий созданные экземпляры."""
+
+    created = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        CountingSurface.created += 1
+
+
+def time_case(run, frames, warmup=20):
+    for frame in range(warmup):
+        run(frame)
+    times = []
+    for frame in range(warmup, warmup + frames):
+        start = time.perf_counter_ns()
+        run(frame)
+        times.append(time.perf_counter_ns() - start)
+    times.sort()
+    return {
+        "mean_ms": sum(times) / len(times) / 1e6,
+        "p50_ms": times[len(times) // 2] / 1e6,
+        "p99_ms": times[min(len(times) - 1, int(len(times) * 0.99))] / 1e6,
+    }
+
+
+def measure_allocations(run, frames, start_frame):
+    """Средний пик памяти Python и число новых Surface за кадр."""
+    surface_class = pygame.Surface
+    pygame.Surface = CountingSurface
+    CountingSurface.created = 0
+    tracemalloc.start()
+    peak = 0
+    try:
+        for frame in range(start_frame, start_frame + frames):
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            run(frame)
+            peak += tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+        pygame.Surface = surface_class
+    return {
+        "peak_alloc_kib": peak / frames / 1024,
+        "surfaces_per_frame": CountingSurface.created / frames,
+    }
+
+
+def run_suite(frames=500, alloc_frames=50, cases=None, states=None):
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    results = []
+    for state in states or BOARD_STATES:
+        for name in cases or CASES:
+            screen.fill(BLACK)
+            run = CASES[name](screen, BOARD_STATES[state])
+            result = {"case": name, "state": state, "frames": frames}
+            result.update(time_case(run, frames))
+            result.update(measure_allocations(run, alloc_frames, frames + 20))
+            results.append(result)
+    pygame.quit()
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "sdl": ".".join(map(str, pygame.get_sdl_version())),
+        "video_driver": os.environ["SDL_VIDEODRIVER"],
+        "screen": [SCREEN_WIDTH, SCREEN_HEIGHT],
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер отрисовки без монитора.")
+    parser.add_argument("--frames", type=int, default=500)
+    parser.add_argument("--alloc-frames", type=int, default=50)
+    parser.add_argument("--case", action="append", choices=sorted(CASES),
+                        help="только указанные замеры (можно несколько раз)")
+    parser.add_argument("--state", action="append", choices=sorted(BOARD_STATES))
+    parser.add_argument("--output", default=None, help="файл JSON вместо stdout")
+    args = parser.parse_args()
+    report = run_suite(args.frames, args.alloc_frames, args.case, args.state)
+    for result in report["results"]:
+        print(f"{result['case']:>13} {result['state']:>12}: "
+              f"mean {result['mean_ms']:.3f} p50 {result['p50_ms']:.3f} "
+              f"p99 {result['p99_ms']:.3f} мс, "
+              f"{result['peak_alloc_kib']:.1f} КиБ, "
+              f"{result['surfaces_per_frame']:.2f} Surface/кадр", file=sys.stderr)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
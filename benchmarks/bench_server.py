@@ -0,0 +1,260 @@
+# bench_server.py
+"""Нагрузочный тест сервера сражений: тысячи комнат в одном процессе.
+
+Сервер запускается в отдельном процессе (один поток asyncio). Генератор
+открывает 2 * --rooms подключений, ждет начала игры во всех комнатах и
+--seconds секунд шлет от каждого игрока сообщения, закодированные
+заранее:
+  - по умолчанию --rate состояний в секунду (ключевые кадры и дельты
+    партии ИИ); для каждого состояния, пересланного сопернику, меряется
+    задержка от отправки до получения;
+  - с --authoritative сервер сам ведет партии, а игроки шлют входы ИИ,
+    который нажимает клавишу раз в --input-every кадров, в темпе шагов
+    симуляции.
+Выводятся доставленная доля, задержки p50/p99, трафик на игрока и
+загрузка процессора сервером (по /proc, только Linux). Генератор и
+сервер делят машину, поэтому на одном ядре задержки включают и его.
+--rate по умолчанию близок к темпу живого игрока; ИИ из bench_sync
+шлет около 15 состояний в секунду.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_server [--rooms 2000] [--rate 3] [--seconds 20]
+                                      [--authoritative] [--input-every 8]
+"""
+
+import argparse
+import asyncio
+import heapq
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+
+from benchmarks.bench_sync import ai_frames, game_state
+from game.ai import AIController
+from game.engine import TetrisEngine, HELD_INPUTS
+from game.settings import global_settings
+from network.authority import InputSender
+from network.battle_server import BattleServer
+from network.protocol import *
+from network.publisher import StatePublisher
+
+FRAME_MS = 16
+CONNECT_BATCH = 200  # Одновременных попыток подключения
+SEND_TICK = 0.005  # Шаг расписания отправки, секунды
+
+
+def make_messages(count, rate, seed=1):
+    """(время отправки, сообщение): count состояний партии ИИ, отправленных
+    StatePublisher, по rate в секунду."""
+    states = []
+    publisher = StatePublisher(states.append, lambda: game_state(engine))
+    for frame, engine in enumerate(ai_frames(seed, count * 60)):
+        key = (engine.grid, engine.grid.version, engine.held_shape,
+               engine.bag.position, engine.score, engine.level, engine.game_over)
+        publisher.update(key, frame * FRAME_MS)
+        if len(states) >= count:
+            break
+    # Сервер подтверждает каждое состояние раньше следующей отправки
+    encoder = StateEncoder(auto_ack=True)
+    return [(i / rate, encoder.encode(state)) for i, state in enumerate(states)]
+
+
+def make_inputs(seconds, input_every, seed=1):
+    """(время отправки, сообщение): MSG_INPUT игрока ИИ за seconds секунд.
+
+    После проигрыша начинается новая партия, номера шагов продолжаются.
+    """
+    tick_ms = global_settings["tick_ms"]
+    messages = []
+    sender = InputSender(
+        lambda message: messages.append((sender.tick * tick_ms / 1000, message)), tick_ms)
+    engine = None
+    for frame in range(int(seconds * 1000 / FRAME_MS)):
+        if engine is None or engine.game_over:
+            engine = TetrisEngine(seed=seed + frame)
+            engine.input_listener = sender
+            controller = AIController()
+        inputs = controller.next_input(engine) if frame % input_every == 0 else 0
+        for _ in range(FRAME_MS // tick_ms):
+            engine.step(inputs, tick_ms)
+            inputs &= HELD_INPUTS
+    return messages
+
+
+def run_server(port, authoritative):
+    sys.stdout = open(os.devnull, "w")  # Без строки на каждое подключение
+    BattleServer(host="127.0.0.1", port=port, authoritative=authoritative).start()
+
+
+def cpu_seconds(pid):
+    """Время процессора процесса pid, секунды (None вне Linux)."""
+    try:
+        with open(f"/proc/{pid}/stat") as file:
+            fields = file.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+class LoadClient(asyncio.Protocol):
+    """Игрок генератора: считает сообщения и задержку пересылки."""
+
+    def __init__(self, stats, track_latency):
+        self.stats = stats
+        self.track_latency = track_latency
+        self.stream = MessageStream()
+        self.transport = None
+        self.started = asyncio.get_running_loop().create_future()
+        self.opponent = None
+        self.sent_times = deque()  # Время отправки еще не пересланных состояний
+        self.position = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self.stats["bytes_down"] += len(data)
+        for msg_type, payload, _ in self.stream.feed(data):
+            if msg_type == MSG_START:
+                if not self.started.done():
+                    self.started.set_result(decode_start(payload)[0])
+            elif msg_type == MSG_STATE or msg_type == MSG_DELTA:
+                sent_times = self.opponent.sent_times if self.opponent else None
+                if sent_times:
+                    self.stats["latency"].append(time.perf_counter() - sent_times.popleft())
+                self.stats["received"] += 1
+            elif msg_type == MSG_ACK:
+                self.stats["acks"] += 1
+            elif msg_type == MSG_RESYNC:
+                self.stats["resyncs"] += 1
+
+    def connection_lost(self, exc):
+        self.stats["lost"] += 1
+        if not self.started.done():
+            self.started.set_exception(ConnectionError("соединение закрыто"))
+
+    def send_next(self, messages):
+        if self.track_latency:
+            self.sent_times.append(time.perf_counter())
+        message = messages[self.position][1]
+        self.transport.write(message)
+        self.position += 1
+        self.stats["sent"] += 1
+        self.stats["bytes_up"] += len(message)
+
+
+async def connect_all(port, count, stats, track_latency):
+    loop = asyncio.get_running_loop()
+    clients = []
+    for start in range(0, count, CONNECT_BATCH):
+        batch = await asyncio.gather(*(
+            loop.create_connection(
+                lambda: LoadClient(stats, track_latency), "127.0.0.1", port)
+            for _ in range(min(CONNECT_BATCH, count - start))))
+        clients += [protocol for _, protocol in batch]
+    return clients
+
+
+async def pair_clients(clients):
+    """Соперники по seed комнаты: сервер дает каждой паре свой seed."""
+    seeds = await asyncio.gather(*(client.started for client in clients))
+    rooms = {}
+    for client, seed in zip(clients, seeds):
+        rooms.setdefault(seed, []).append(client)
+    for pair in rooms.values():
+        if len(pair) == 2:
+            pair[0].opponent, pair[1].opponent = pair[1], pair[0]
+    return [client for client in clients if client.opponent is not None]
+
+
+async def load(port, rooms, seconds, messages, server_pid, track_latency):
+    stats = {"sent": 0, "received": 0, "acks": 0, "resyncs": 0, "lost": 0,
+             "bytes_up": 0, "bytes_down": 0, "latency": []}
+    start = time.perf_counter()
+    clients = await connect_all(port, 2 * rooms, stats, track_latency)
+    connected = time.perf_counter() - start
+    clients = await asyncio.wait_for(pair_clients(clients), 60)
+    started = time.perf_counter() - start
+
+    # Клиенты начинают со сдвигом внутри первой секунды, дальше каждый
+    # шлет сообщения по их времени отправки
+    count = len(clients)
+    queue = [(i / count, i) for i in range(count)]
+    stats["bytes_down"] = 0  # Без сообщений подключения и начала игры
+    cpu_before = cpu_seconds(server_pid)
+    begin = time.perf_counter()
+    elapsed = 0
+    while elapsed < seconds:
+        await asyncio.sleep(SEND_TICK)
+        elapsed = time.perf_counter() - begin
+        while queue and queue[0][0] <= elapsed:
+            i = queue[0][1]
+            client = clients[i]
+            client.send_next(messages)
+            if client.position < len(messages):
+                heapq.heapreplace(queue, (i / count + messages[client.position][0], i))
+            else:
+                heapq.heappop(queue)
+    cpu_after = cpu_seconds(server_pid)
+    await asyncio.sleep(1)  # Досылаем то, что еще в пути
+    stats.update(connect_s=connected, start_s=started, elapsed_s=elapsed,
+                 rooms=len(clients) // 2, dropped=stats["lost"], cpu_before=cpu_before,
+                 cpu_after=cpu_after)
+    for client in clients:
+        client.transport.close()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест сервера сражений.")
+    parser.add_argument("--rooms", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=3,
+                        help="состояний в секунду от каждого игрока")
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--authoritative", action="store_true",
+                        help="игру ведет сервер, игроки шлют только входы")
+    parser.add_argument("--input-every", type=int, default=8,
+                        help="кадров между нажатиями ИИ при --authoritative")
+    parser.add_argument("--port", type=int, default=5600)
+    args = parser.parse_args()
+
+    if args.authoritative:
+        messages = make_inputs(args.seconds + 1, args.input_every)
+    else:
+        messages = make_messages(int(args.rate * (args.seconds + 1)), args.rate)
+    server = multiprocessing.Process(
+        target=run_server, args=(args.port, args.authoritative), daemon=True)
+    server.start()
+    time.sleep(1)
+    try:
+        stats = asyncio.run(load(args.port, args.rooms, args.seconds, messages,
+                                 server.pid, not args.authoritative))
+    finally:
+        server.terminate()
+        server.join()
+
+    latency = sorted(stats["latency"])
+    print(f"комнат: {stats['rooms']} ({2 * stats['rooms']} подключений), "
+          f"подключение {stats['connect_s']:.1f} с, начало игры {stats['start_s']:.1f} с")
+    print(f"отправлено {stats['sent']} сообщений ({stats['sent'] / stats['elapsed_s']:,.0f}/с), "
+          f"получено состояний соперника {stats['received']} "
+          f"({stats['received'] / max(stats['sent'], 1):.1%}), "
+          f"подтверждений {stats['acks']}, resync {stats['resyncs']}, "
+          f"разрывов {stats['dropped']}")
+    per_player = 2 * stats["rooms"] * stats["elapsed_s"]
+    print(f"трафик на игрока: к серверу {stats['bytes_up'] / per_player:.0f} байт/с, "
+          f"от сервера {stats['bytes_down'] / per_player:.0f} байт/с")
+    if latency:
+        print(f"задержка пересылки: p50 {latency[len(latency) // 2] * 1e3:.1f} мс, "
+              f"p99 {latency[int(len(latency) * 0.99)] * 1e3:.1f} мс, "
+              f"max {latency[-1] * 1e3:.1f} мс")
+    if stats["cpu_before"] is not None and stats["cpu_after"] is not None:
+        cpu = stats["cpu_after"] - stats["cpu_before"]
+        print(f"процессор сервера: {cpu / stats['elapsed_s']:.0%} "
+              f"одного ядра")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# bench_survivor.py
+"""Сражение, в котором один игрок проигрывает сразу.
+
+Сервер сражений и два BattleClient работают в этом процессе без
+отрисовки. Игрок A - ИИ, нажимающий клавишу раз в --input-every кадров,
+игрок B сбрасывает фигуры каждый кадр, быстро проигрывает и дальше
+молчит. Сражение идет --seconds секунд (по умолчанию дольше
+RECEIVE_TIMEOUT клиента), и для A выводится, остался ли он подключен,
+сколько сообщений каждого типа получил и самая долгая пауза между ними:
+оставшийся игрок не должен терять соединение оттого, что соперник
+больше ничего не присылает.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_survivor [--seconds 40] [--authoritative]
+                                        [--input-every 8]
+"""
+
+import argparse
+import threading
+import time
+from collections import Counter
+
+from benchmarks.bench_sync import game_state, state_key
+from game.ai import AIController
+from game.engine import TetrisEngine, INPUT_HARD_DROP, HELD_INPUTS
+from game.replay import SETTINGS_FIELDS
+from game.settings import global_settings
+from network.authority import InputSender
+from network.battle_client import BattleClient, RECEIVE_TIMEOUT
+from network.battle_server import BattleServer
+from network.publisher import StatePublisher
+
+FRAME_MS = 16
+
+
+class Player:
+    """Подключение, партия и способ отправки, как у BattleTetrisGame."""
+
+    def __init__(self, port):
+        self.client = BattleClient("127.0.0.1", port)
+        self.client.connect()
+        self.received = Counter()  # Тип сообщения -> сколько получено
+        self.max_gap = 0  # Самая долгая пауза между сообщениями, секунды
+        self.last_message = None
+        handle_message = self.client.handle_message
+
+        def record(msg_type, payload):
+            now = time.perf_counter()
+            if self.last_message is not None:
+                self.max_gap = max(self.max_gap, now - self.last_message)
+            self.last_message = now
+            self.received[msg_type] += 1
+            handle_message(msg_type, payload)
+
+        self.client.handle_message = record
+        self.engine = None
+        self.publisher = None
+        self.tick_ms = global_settings["tick_ms"]
+
+    def start(self):
+        client = self.client
+        rules = client.rules
+        settings = global_settings if rules is None else rules
+        self.engine = TetrisEngine(
+            seed=client.seed, **{field: settings[field] for field in SETTINGS_FIELDS})
+        if rules is None:
+            self.publisher = StatePublisher(
+                client.send_data, lambda: game_state(self.engine),
+                global_settings["max_state_rate"])
+        else:
+            self.tick_ms = rules["tick_ms"]
+            self.engine.input_listener = InputSender(client.send_message, self.tick_ms)
+
+    def frame(self, inputs, now_ms):
+        engine = self.engine
+        if engine.game_over:
+            return
+        for _ in range(FRAME_MS // self.tick_ms):
+            engine.step(inputs, self.tick_ms)
+            inputs &= HELD_INPUTS
+        if self.publisher is not None:
+            self.publisher.update(state_key(engine), now_ms)
+        elif engine.game_over:
+            engine.input_listener.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сражение с рано проигравшим соперником.")
+    parser.add_argument("--seconds", type=float, default=RECEIVE_TIMEOUT + 10)
+    parser.add_argument("--authoritative", action="store_true",
+                        help="игру ведет сервер, игроки шлют только входы")
+    parser.add_argument("--input-every", type=int, default=8,
+                        help="кадров между нажатиями ИИ игрока A")
+    parser.add_argument("--port", type=int, default=5800)
+    args = parser.parse_args()
+
+    server = BattleServer(host="127.0.0.1", port=args.port, authoritative=args.authoritative)
+    threading.Thread(target=server.start, daemon=True).start()
+    time.sleep(0.5)
+    survivor, loser = Player(args.port), Player(args.port)
+    deadline = time.perf_counter() + 10
+    while not (survivor.client.game_started and loser.client.game_started):
+        if time.perf_counter() > deadline:
+            raise SystemExit("Игра не началась")
+        time.sleep(0.05)
+    survivor.start()
+    loser.start()
+
+    controller = AIController()
+    start = time.perf_counter()
+    lost_at = None
+    frame = 0
+    while time.perf_counter() - start < args.seconds and survivor.client.connected:
+        now_ms = frame * FRAME_MS
+        inputs = controller.next_input(survivor.engine) if frame % args.input_every == 0 else 0
+        survivor.frame(inputs, now_ms)
+        loser.frame(INPUT_HARD_DROP, now_ms)
+        if lost_at is None and loser.engine.game_over:
+            lost_at = time.perf_counter() - start
+        frame += 1
+        delay = start + frame * FRAME_MS / 1000 - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    elapsed = time.perf_counter() - start
+    if survivor.last_message is not None:
+        # Пауза до конца сражения или до отключения тоже считается
+        survivor.max_gap = max(survivor.max_gap, time.perf_counter() - survivor.last_message)
+
+    mode = "сервер-арбитр" if args.authoritative else "пересылка состояний"
+    print(f"{mode}: B проиграл через {lost_at or 0:.1f} с, сражение шло {elapsed:.1f} с")
+    print(f"A: подключен {survivor.client.connected}, проиграл {survivor.engine.game_over}, "
+          f"фигур {survivor.engine.pieces_placed}")
+    print(f"A получил сообщений: {dict(sorted(survivor.received.items()))}, "
+          f"самая долгая пауза {survivor.max_gap:.1f} с (таймаут клиента {RECEIVE_TIMEOUT} с)")
+    survivor.client.disconnect()
+    loser.client.disconnect()
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+# bench_sync.py
+"""Трафик синхронизации сражения: pickle, полные кадры и дельты.
+
+Сражение из двух игроков ИИ с общим seed длиной --minutes минут (или
+две записи партий через --replay) проигрывается по кадрам 60 Гц, и
+каждое состояние игрока кодируется так, как его отправлял бы клиент:
+pickle с ASCII-префиксом длины, полный двоичный кадр и дельта от
+подтвержденной базы (подтверждение приходит через --rtt кадров), а
+также дельты, отправляемые только при изменениях и не чаще --rate в
+секунду (StatePublisher). Выводятся байты и сообщения в секунду на
+игрока от клиента к серверу и обратно.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_sync [--minutes 5] [--rtt 3] [--rate 30]
+                                    [--replay A.trpl B.trpl]
+"""
+
+import argparse
+import pickle
+from collections import deque
+
+from game.ai import AIController
+from game.engine import TetrisEngine
+from game.replay import Replay
+from network.protocol import StateEncoder, encode_state, encode_ack
+from network.publisher import StatePublisher
+
+FRAME_MS = 16
+TICK_MS = 4
+
+
+def ai_frames(seed, frames):
+    """Кадры партии ИИ; после проигрыша начинается новая партия."""
+    engine = TetrisEngine(seed=seed)
+    controller = AIController()
+    for frame in range(frames):
+        if engine.game_over:
+            engine = TetrisEngine(seed=seed + frame)
+            controller = AIController()
+        inputs = controller.next_input(engine)
+        for _ in range(FRAME_MS // TICK_MS):
+            engine.step(inputs, TICK_MS)
+            inputs = 0
+        yield engine
+
+
+def replay_frames(path, frames):
+    """Кадры записанной партии: состояние на каждой границе FRAME_MS."""
+    replay = Replay.load(path)
+    engine = replay.create_engine()
+    elapsed = 0
+    next_frame = FRAME_MS
+    produced = 0
+    for inputs, dt_ms in replay.steps():
+        engine.step(inputs, dt_ms)
+        elapsed += dt_ms
+        while elapsed >= next_frame and produced < frames:
+            yield engine
+            produced += 1
+            next_frame += FRAME_MS
+    replay.close()
+
+
+def game_state(engine):
+    return {
+        "rows": list(engine.grid.rows),
+        "score": engine.score,
+        "level": engine.level,
+        "held_shape": engine.held_shape,
+        "bag_position": engine.bag.position,
+        "game_over": engine.game_over,
+    }
+
+
+def state_key(engine):
+    """Тот же ключ, что BattleTetrisGame.state_key."""
+    return (engine.grid, engine.grid.version, engine.held_shape, engine.bag.position,
+            engine.score, engine.level, engine.game_over)
+
+
+class Link:
+    """Поток одного игрока через сервер: дельты к серверу, подтверждения
+    через rtt кадров и пересылка сопернику."""
+
+    def __init__(self, rtt):
+        self.rtt = rtt
+        self.upstream = StateEncoder()
+        self.downstream = StateEncoder(auto_ack=True)
+        self.acks = deque()
+        self.frame = 0
+        self.up_bytes = 0
+        self.down_bytes = 0  # Байты, которые получит соперник
+        self.ack_bytes = 0  # Подтверждения, которые получит сам игрок
+        self.messages = 0
+
+    def send(self, state):
+        message = self.upstream.encode(state)
+        self.up_bytes += len(message)
+        self.messages += 1
+        self.ack_bytes += len(encode_ack(self.upstream.seq))
+        self.down_bytes += len(self.downstream.encode(state))
+        self.acks.append((self.frame + self.rtt, self.upstream.seq))
+
+    def tick(self, frame):
+        self.frame = frame
+        while self.acks and self.acks[0][0] <= frame:
+            self.upstream.ack(self.acks.popleft()[1])
+
+
+def pickle_state(engine):
+    """Сообщение в старом формате: 10 байт ASCII-длины + pickle."""
+    data = pickle.dumps({
+        "grid": engine.grid.grid,
+        "score": engine.score,
+        "level": engine.level,
+        "held_shape": engine.held_shape,
+        "next_shapes": engine.next_shapes,
+    })
+    return 10 + len(data)
+
+
+def measure(players, rtt, rate):
+    """Байты и сообщения по каждому способу для каждого игрока."""
+    totals = [{"pickle": 0, "full": 0} for _ in players]
+    every_frame = [Link(rtt) for _ in players]
+    published = [Link(rtt) for _ in players]
+    publishers = []
+    current = [None] * len(players)
+    for i, link in enumerate(published):
+        publishers.append(StatePublisher(
+            link.send, lambda i=i: game_state(current[i]), rate))
+    frames = 0
+    for engines in zip(*players):
+        frames += 1
+        for i, engine in enumerate(engines):
+            current[i] = engine
+            state = game_state(engine)
+            totals[i]["pickle"] += pickle_state(engine)
+            totals[i]["full"] += len(encode_state(state, frames))
+            every_frame[i].tick(frames)
+            every_frame[i].send(state)
+            published[i].tick(frames)
+            publishers[i].update(state_key(engine), frames * FRAME_MS)
+    for i, total in enumerate(totals):
+        other = 1 - i
+        total["delta_up"] = every_frame[i].up_bytes
+        total["delta_down"] = every_frame[other].down_bytes + every_frame[i].ack_bytes
+        total["delta_messages"] = every_frame[i].messages
+        total["published_up"] = published[i].up_bytes
+        total["published_down"] = published[other].down_bytes + published[i].ack_bytes
+        total["published_messages"] = published[i].messages
+        total["publisher"] = publishers[i].stats()
+    return frames, totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Трафик синхронизации сражения.")
+    parser.add_argument("--minutes", type=float, default=5)
+    parser.add_argument("--rtt", type=int, default=3,
+                        help="задержка подтверждения, кадров")
+    parser.add_argument("--rate", type=int, default=30,
+                        help="лимит отправок состояния в секунду")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--replay", nargs=2, default=None,
+                        help="две записи партий вместо игры ИИ")
+    args = parser.parse_args()
+
+    frames = int(args.minutes * 60 * 1000 / FRAME_MS)
+    if args.replay:
+        players = [replay_frames(path, frames) for path in args.replay]
+    else:
+        players = [ai_frames(args.seed, frames), ai_frames(args.seed, frames)]
+    frames, totals = measure(players, args.rtt, args.rate)
+    seconds = frames * FRAME_MS / 1000
+    print(f"{frames} кадров ({seconds:.0f} с), подтверждение через {args.rtt} кадра")
+    for i, total in enumerate(totals):
+        print(f"игрок {i}: байт/с на игрока")
+        print(f"  pickle:                        {total['pickle'] / seconds:10.0f}")
+        print(f"  полный кадр:                   {total['full'] / seconds:10.0f}")
+        print(f"  дельты каждый кадр, к серверу: {total['delta_up'] / seconds:10.0f}"
+              f"  ({total['delta_messages'] / seconds:.1f} сообщ./с)")
+        print(f"  дельты каждый кадр, от сервера:{total['delta_down'] / seconds:10.0f}")
+        print(f"  по событиям, к серверу:        {total['published_up'] / seconds:10.0f}"
+              f"  ({total['published_messages'] / seconds:.1f} сообщ./с)")
+        print(f"  по событиям, от сервера:       {total['published_down'] / seconds:10.0f}")
+        print("  публикация: отправлено {sent}, подавлено кадров {suppressed}, "
+              "объединено {coalesced}".format(**total["publisher"]))
+
+
+if __name__ == "__main__":
+    main()
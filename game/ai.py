@@ -0,0 +1,257 @@
+# ai.py
+
+import time
+from collections import deque
+
+from .constants import GRID_WIDTH
+from .engine import *
+
+# Веса эвристики: суммарная высота, очищенные линии, дыры, неровность
+DEFAULT_WEIGHTS = {
+    "height": -0.510066,
+    "lines": 0.760666,
+    "holes": -0.35663,
+    "bumpiness": -0.184483,
+}
+
+# Действия поиска и соответствующие им входы движка
+_ROTATE, _LEFT, _RIGHT, _DROP = range(4)
+_ACTION_INPUTS = {
+    _ROTATE: INPUT_ROTATE,
+    _LEFT: INPUT_SHIFT_LEFT,
+    _RIGHT: INPUT_SHIFT_RIGHT,
+    _DROP: INPUT_SONIC_DROP,
+}
+
+LOOKAHEAD_WIDTH = 6  # Сколько лучших по одной фигуре положений оценивается глубже
+
+
+class Placement:
+    """Конечное положение фигуры и входы, которые к нему приводят.
+
+    expected[i] - (id фигуры, x), которые должны быть у текущей фигуры
+    перед подачей inputs[i].
+    """
+
+    __slots__ = ("piece", "x", "y", "score", "inputs", "expected")
+
+    def __init__(self, piece, x, y, score, inputs, expected):
+        self.piece = piece
+        self.x = x
+        self.y = y
+        self.score = score
+        self.inputs = inputs
+        self.expected = expected
+
+
+class TetrisAI:
+    """Компьютерный игрок: перебор достижимых положений и оценка поля.
+
+    Достижимые конечные положения ищутся поиском в ширину по состояниям
+    (фигура в повороте, x, y) с переходами "повернуть", "сдвинуть" и
+    "опустить до приземления", поэтому находятся и подсовывания под навес.
+
+    С lookahead все положения (и с hold) сначала ранжируются по оценке
+    поля после одной фигуры, затем лучшие LOOKAHEAD_WIDTH из них, пока
+    хватает time_budget_ms, оцениваются с учетом следующей фигуры; выбор
+    делается только среди оцененных так, чтобы не сравнивать оценки
+    разной глубины.
+    """
+
+    def __init__(self, weights=None, use_hold=True, lookahead=False,
+                 time_budget_ms=2.0):
+        self.weights = dict(DEFAULT_WEIGHTS if weights is None else weights)
+        self.use_hold = use_hold
+        self.lookahead = lookahead
+        self.time_budget_ms = time_budget_ms
+
+    def plan(self, engine):
+        """Лучшее размещение текущей фигуры и входы для него (по одному на шаг)."""
+        deadline = time.perf_counter() + self.time_budget_ms / 1000
+        grid = engine.grid
+        # Положения текущей фигуры перебираются всегда, иначе ходить нечем;
+        # hold и следующая фигура - только пока есть время
+        candidates = [
+            (candidate, engine.next_shapes[0], False)
+            for candidate in self.candidates(
+                grid, engine.current_shape, engine.current_x, engine.current_y)]
+        if self.use_hold and not engine.held_used:
+            if engine.held_shape is not None:
+                alternative = engine.held_shape
+                following = engine.next_shapes[0]
+            else:
+                alternative = engine.next_shapes[0]
+                following = engine.next_shapes[1]
+            spawn_x = GRID_WIDTH // 2 - alternative.width // 2
+            if grid.valid_move(alternative.shape, spawn_x, 0):
+                held = self.candidates(grid, alternative, spawn_x, 0, deadline)
+                if held is not None:
+                    candidates += [(candidate, following, True) for candidate in held]
+        if not candidates:
+            return None
+        candidates.sort(key=lambda item: item[0][0], reverse=True)
+        best, score = candidates[0], candidates[0][0][0]
+        if self.lookahead:
+            deepened = None
+            for item in candidates[:LOOKAHEAD_WIDTH]:
+                candidate, following, _ = item
+                next_score = self._best_next_score(
+                    candidate[5], candidate[6], grid, following, candidate[0], deadline)
+                if next_score is None:
+                    break  # Время вышло: остальные не оцениваются вовсе
+                if deepened is None or next_score > deepened[1]:
+                    deepened = (item, next_score)
+            if deepened is not None:
+                best, score = deepened
+        (_, final_piece, px, py, path, _, _), _, use_hold = best
+        inputs, expected = self._path_inputs(path)
+        if use_hold:
+            inputs = [INPUT_HOLD] + inputs
+            expected = [(engine.current_shape.id, engine.current_x)] + expected
+        return Placement(final_piece, px, py, score, inputs, expected)
+
+    def placements(self, grid, piece, x, y, deadline=None):
+        """Все достижимые конечные положения: {(маски, x, y): (фигура, путь)}.
+
+        None, если deadline наступил раньше, чем поиск закончился.
+        """
+        # Состояния различаются масками, а не id, чтобы симметричные
+        # повороты (O, I, S, Z) не перебирались повторно
+        start = (piece, x, y)
+        parents = {(piece.masks, x, y): None}
+        queue = deque([start])
+        finals = {}
+        while queue:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None
+            state = queue.popleft()
+            piece, x, y = state
+            landing = grid.landing_y(piece, x, y)
+            moves = []
+            if landing == y:
+                finals[(piece.masks, x, y)] = state
+            else:
+                moves.append((_DROP, piece, x, landing))
+            rotated = piece.rotate()
+            if grid.valid_masks(rotated.masks, x, y):
+                moves.append((_ROTATE, rotated, x, y))
+            if grid.valid_masks(piece.masks, x - 1, y):
+                moves.append((_LEFT, piece, x - 1, y))
+            if grid.valid_masks(piece.masks, x + 1, y):
+                moves.append((_RIGHT, piece, x + 1, y))
+            for action, next_piece, next_x, next_y in moves:
+                key = (next_piece.masks, next_x, next_y)
+                if key not in parents:
+                    parents[key] = (state, action)
+                    queue.append((next_piece, next_x, next_y))
+        return {key: (state[0], (parents, state))
+                for key, state in finals.items()}
+
+    def _path_inputs(self, path):
+        """Входы и ожидаемые перед ними (id фигуры, x) для пути из placements."""
+        parents, state = path
+        final = state
+        steps = []
+        link = parents[(state[0].masks, state[1], state[2])]
+        while link is not None:
+            state, action = link
+            steps.append((action, state))
+            link = parents[(state[0].masks, state[1], state[2])]
+        steps.reverse()
+        # Последнее опускание заменяется сбросом, который фиксирует фигуру
+        if steps and steps[-1][0] == _DROP:
+            final = steps.pop()[1]
+        inputs = [_ACTION_INPUTS[action] for action, _ in steps]
+        expected = [(state[0].id, state[1]) for _, state in steps]
+        inputs.append(INPUT_HARD_DROP)
+        expected.append((final[0].id, final[1]))
+        return inputs, expected
+
+    def candidates(self, grid, piece, x, y, deadline=None):
+        """Положения фигуры с оценкой поля после нее: список (оценка, фигура,
+        x, y, путь, строки поля, очищенные линии); None, если не успели."""
+        placements = self.placements(grid, piece, x, y, deadline)
+        if placements is None:
+            return None
+        rows = grid.rows
+        result = []
+        for (masks, px, py), (final_piece, path) in placements.items():
+            new_rows, lines = place_and_clear(rows, masks, px, py, grid.full_mask)
+            result.append((self.evaluate(new_rows, lines, grid.width),
+                           final_piece, px, py, path, new_rows, lines))
+        return result
+
+    def _best_next_score(self, rows, lines, grid, piece, fallback, deadline=None):
+        """Лучшая оценка после еще одной фигуры; None, если не успели."""
+        board = grid.__class__(grid.width, grid.height)
+        board.rows = rows
+        spawn_x = grid.width // 2 - piece.width // 2
+        if not board.valid_masks(piece.masks, spawn_x, 0):
+            return fallback - 1000
+        placements = self.placements(board, piece, spawn_x, 0, deadline)
+        if placements is None:
+            return None
+        best = None
+        for masks, px, py in placements:
+            new_rows, next_lines = place_and_clear(
+                rows, masks, px, py, grid.full_mask)
+            score = self.evaluate(new_rows, lines + next_lines, grid.width)
+            if best is None or score > best:
+                best = score
+        return fallback if best is None else best
+
+    def evaluate(self, rows, lines, width):
+        heights = [0] * width
+        height = len(rows)
+        holes = 0
+        covered = 0
+        for r, row in enumerate(rows):
+            holes += (covered & ~row).bit_count()
+            new = row & ~covered
+            while new:
+                low = new & -new
+                heights[low.bit_length() - 1] = height - r
+                new ^= low
+            covered |= row
+        bumpiness = sum(abs(heights[i] - heights[i + 1])
+                        for i in range(width - 1))
+        weights = self.weights
+        return (weights["height"] * sum(heights)
+                + weights["lines"] * lines
+                + weights["holes"] * holes
+                + weights["bumpiness"] * bumpiness)
+
+
+def place_and_clear(rows, masks, x, y, full_mask):
+    """Копия строк поля с размещенной фигурой и число очищенных линий."""
+    new_rows = rows[:]
+    for i, mask in enumerate(masks):
+        if mask:
+            new_rows[y + i] |= mask << x if x >= 0 else mask >> -x
+    kept = [row for row in new_rows if row != full_mask]
+    lines = len(new_rows) - len(kept)
+    if lines:
+        kept = [0] * lines + kept
+    return kept, lines
+
+
+class AIController:
+    """Источник входов для TetrisEngine.step на основе TetrisAI.
+
+    План пересчитывается, когда фигура или ее столбец расходятся с
+    ожидаемыми (новая фигура или действие не удалось, например, из-за
+    гравитации).
+    """
+
+    def __init__(self, ai=None):
+        self.ai = TetrisAI() if ai is None else ai
+        self.queue = deque()
+
+    def next_input(self, engine):
+        state = (engine.current_shape.id, engine.current_x)
+        if not self.queue or self.queue[0][1] != state:
+            placement = self.ai.plan(engine)
+            if placement is None:
+                return INPUT_HARD_DROP
+            self.queue = deque(zip(placement.inputs, placement.expected))
+        return self.queue.popleft()[0]
@@ -0,0 +1,65 @@
+# atlas.py
+
+import pygame
+
+from .constants import *
+
+# Виды клеток в атласе
+TILE_PIECE = "piece"  # Падающая фигура
+TILE_GHOST = "ghost"  # Тень фигуры (полупрозрачная)
+TILE_BLOCK = "block"  # Клетка фигуры в превью, с рамкой
+TILE_LOCKED = "locked"  # Занятая клетка поля
+
+GHOST_ALPHA = 128
+
+_atlas = None
+
+
+class SpriteAtlas:
+    """Все клетки фигур, заранее нарисованные в одной поверхности.
+
+    Для каждого цвета из SHAPE_COLORS хранится клетка фигуры, тени и
+    превью, плюс клетка занятого поля. Отрисовка - только blit участков
+    атласа, без создания поверхностей в кадре.
+    """
+
+    def __init__(self, size=GRID_SIZE):
+        self.size = size
+        tiles = [(WHITE, TILE_LOCKED)]
+        for color in SHAPE_COLORS.values():
+            tiles += [(color, TILE_PIECE), (color, TILE_GHOST), (color, TILE_BLOCK)]
+        self.surface = pygame.Surface((size * len(tiles), size), pygame.SRCALPHA)
+        self.areas = {}
+        for index, (color, kind) in enumerate(tiles):
+            area = pygame.Rect(index * size, 0, size, size)
+            alpha = GHOST_ALPHA if kind == TILE_GHOST else 255
+            self.surface.fill((*color, alpha), area)
+            if kind in (TILE_BLOCK, TILE_LOCKED):
+                pygame.draw.rect(self.surface, GRAY, area, 1)
+            self.areas[(color, kind)] = area
+
+    def convert(self):
+        """Перевод атласа в формат экрана (после pygame.display.set_mode)."""
+        self.surface = self.surface.convert_alpha()
+
+    def area(self, color, kind):
+        return self.areas[(color, kind)]
+
+    def draw_cells(self, screen, cells, color, kind, left, top):
+        """Отрисовка клеток (j, i) одной пачкой Surface.blits от точки (left, top)."""
+        surface = self.surface
+        area = self.areas[(color, kind)]
+        size = self.size
+        screen.blits(
+            [(surface, (left + j * size, top + i * size), area) for j, i in cells],
+            doreturn=False)
+
+
+def get_atlas():
+    """Общий атлас; строится при первом обращении."""
+    global _atlas
+    if _atlas is None:
+        _atlas = SpriteAtlas()
+        if pygame.display.get_surface() is not None:
+            _atlas.convert()
+    return _atlas
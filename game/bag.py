@@ -0,0 +1,46 @@
+# bag.py
+
+import random
+
+from .pieces import PIECE_NAMES, get_piece
+
+BAG_SIZE = len(PIECE_NAMES)
+
+
+class PieceBag:
+    """Детерминированный генератор фигур по системе "7 в мешке".
+
+    Последовательность полностью задается seed: фигура номер i всегда одна
+    и та же, поэтому два игрока с одним seed получают одинаковые фигуры, а
+    партию можно воспроизвести. Мешки генерируются заранее в bytearray с
+    индексами фигур, выдача и просмотр вперед - O(1).
+    """
+
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.sequence = bytearray()
+        self.position = 0  # Сколько фигур уже выдано
+        self._ensure(2 * BAG_SIZE - 1)  # Запас на просмотр вперед
+
+    def _ensure(self, index):
+        while len(self.sequence) <= index:
+            kinds = list(range(BAG_SIZE))
+            self.rng.shuffle(kinds)
+            self.sequence.extend(kinds)
+
+    def at(self, index):
+        """Фигура с номером index в последовательности (в начальном повороте)."""
+        self._ensure(index)
+        return get_piece(PIECE_NAMES[self.sequence[index]])
+
+    def next(self):
+        piece = self.at(self.position)
+        self.position += 1
+        return piece
+
+    def peek(self, count):
+        """Следующие count фигур без их выдачи."""
+        return [self.at(self.position + i) for i in range(count)]
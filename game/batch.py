@@ -0,0 +1,146 @@
+# batch.py
+
+import numpy as np
+
+from .constants import GRID_WIDTH, GRID_HEIGHT, SCORE_TABLE
+from .pieces import PIECE_LIST, PIECE_NAMES
+
+# Маски строк всех поворотов всех фигур, дополненные до 4 строк:
+# PIECE_MASKS[piece.id, i] - биты i-й строки фигуры
+PIECE_MASKS = np.zeros((len(PIECE_LIST), 4), dtype=np.uint16)
+for _piece in PIECE_LIST:
+    PIECE_MASKS[_piece.id, :_piece.height] = _piece.masks
+PIECE_WIDTHS = np.array([piece.width for piece in PIECE_LIST])
+del _piece
+
+SCORES = np.array([0] + [SCORE_TABLE.get(lines, 0) for lines in range(1, 5)])
+
+_OFFSETS = np.arange(4)
+
+
+class BatchSimulator:
+    """N независимых полей, которые продвигаются одновременно средствами numpy.
+
+    Поля хранятся упакованными: массив rows формы (N, height) из uint16, где
+    бит j строки - столбец j, как в BitBoard. Один шаг - это размещение
+    текущей фигуры каждого поля: фигура поворачивается, сдвигается в
+    столбец x, сбрасывается вниз, фиксируется, затем очищаются линии и
+    начисляются очки по SCORE_TABLE, как в TetrisEngine. Удержание фигуры и
+    автоповтор клавиш здесь не моделируются - это симулятор размещений для
+    ботов и нагрузочных тестов.
+    """
+
+    def __init__(self, n, width=GRID_WIDTH, height=GRID_HEIGHT, seed=None):
+        self.n = n
+        self.width = width
+        self.height = height
+        self.full_mask = (1 << width) - 1
+        self.rng = np.random.default_rng(seed)
+        # 4 заполненные строки снизу служат полом
+        self._padded = np.zeros((n, height + 4), dtype=np.uint16)
+        self._padded[:, height:] = 0xFFFF
+        self.rows = self._padded[:, :height]
+        self.bags = np.empty((n, len(PIECE_NAMES)), dtype=np.int64)
+        self.bag_pos = np.zeros(n, dtype=np.int64)
+        self.current = np.zeros(n, dtype=np.int64)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.lines_cleared = np.zeros(n, dtype=np.int64)
+        self.level = np.ones(n, dtype=np.int64)
+        self.pieces_placed = np.zeros(n, dtype=np.int64)
+        self.game_over = np.zeros(n, dtype=bool)
+        self.reset()
+
+    @property
+    def boards(self):
+        """Поля в виде массива (N, height, width) из bool."""
+        return (self.rows[:, :, None] >> np.arange(self.width, dtype=np.uint16)) & 1 == 1
+
+    def reset(self, mask=None):
+        """Сброс всех полей или только отмеченных в mask."""
+        idx = np.arange(self.n) if mask is None else np.flatnonzero(mask)
+        if idx.size == 0:
+            return
+        self.rows[idx] = 0
+        self.score[idx] = 0
+        self.lines_cleared[idx] = 0
+        self.level[idx] = 1
+        self.pieces_placed[idx] = 0
+        self.game_over[idx] = False
+        self._refill_bags(idx)
+        self._spawn(idx)
+
+    def _refill_bags(self, idx):
+        kinds = np.tile(np.arange(len(PIECE_NAMES)), (idx.size, 1))
+        self.bags[idx] = self.rng.permuted(kinds, axis=1)
+        self.bag_pos[idx] = 0
+
+    def _spawn(self, idx):
+        """Следующая фигура из мешка; поле проигрывает, если ей негде появиться."""
+        kinds = self.bags[idx, self.bag_pos[idx]]
+        self.bag_pos[idx] += 1
+        empty = idx[self.bag_pos[idx] == len(PIECE_NAMES)]
+        if empty.size:
+            self._refill_bags(empty)
+        pieces = kinds * 4
+        self.current[idx] = pieces
+        xs = self.width // 2 - PIECE_WIDTHS[pieces] // 2
+        masks = PIECE_MASKS[pieces] << xs[:, None].astype(np.uint16)
+        blocked = (self._padded[idx, :4] & masks).any(axis=1)
+        self.game_over[idx[blocked]] = True
+
+    def max_x(self, rotations):
+        """Наибольший допустимый столбец для текущих фигур в заданных поворотах."""
+        return self.width - PIECE_WIDTHS[(self.current // 4) * 4 + rotations % 4]
+
+    def step(self, rotations, xs):
+        """Размещение текущей фигуры на всех живых полях.
+
+        rotations и xs - массивы длины N; x обрезается до допустимого
+        диапазона. Возвращает число очищенных линий для каждого поля.
+        """
+        cleared = np.zeros(self.n, dtype=np.int64)
+        idx = np.flatnonzero(~self.game_over)
+        if idx.size == 0:
+            return cleared
+        rotations = np.asarray(rotations)[idx] % 4
+        pieces = (self.current[idx] // 4) * 4 + rotations
+        xs = np.clip(np.asarray(xs)[idx], 0, self.width - PIECE_WIDTHS[pieces])
+        masks = PIECE_MASKS[pieces] << xs[:, None].astype(np.uint16)
+
+        # Столкновения во всех высотах сразу: (живые поля, height + 1)
+        rows = np.arange(self.height + 1)[:, None] + _OFFSETS
+        windows = self._padded[idx[:, None, None], rows[None]]
+        collisions = (windows & masks[:, None, :]).any(axis=2)
+
+        blocked = collisions[:, 0]
+        self.game_over[idx[blocked]] = True
+        alive = ~blocked
+        idx, masks = idx[alive], masks[alive]
+        if idx.size == 0:
+            return cleared
+        landing = collisions[alive, 1:].argmax(axis=1)
+
+        # Фиксация фигуры
+        index = (idx[:, None], landing[:, None] + _OFFSETS)
+        self._padded[index] |= masks
+        self.pieces_placed[idx] += 1
+
+        # Очистка линий: заполненные строки уходят наверх и обнуляются
+        full = self.rows[idx] == self.full_mask
+        counts = full.sum(axis=1)
+        with_lines = counts > 0
+        if with_lines.any():
+            sub = idx[with_lines]
+            order = np.argsort(~full[with_lines], axis=1, kind="stable")
+            rows = np.take_along_axis(self.rows[sub], order, axis=1)
+            rows[np.arange(self.height) < counts[with_lines, None]] = 0
+            self.rows[sub] = rows
+
+        cleared[idx] = counts
+        self.score[idx] += SCORES[np.minimum(counts, 4)]
+        self.lines_cleared[idx] += counts
+        level_up = self.lines_cleared[idx] >= self.level[idx] * 10
+        self.level[idx[level_up]] += 1
+
+        self._spawn(idx)
+        return cleared
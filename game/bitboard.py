@@ -0,0 +1,150 @@
+# bitboard.py
+
+from .constants import GRID_WIDTH, GRID_HEIGHT
+
+# Кэш масок фигур по id объекта; сам объект хранится рядом, чтобы его id
+# не мог быть переиспользован, пока запись находится в кэше
+_mask_cache = {}
+_MASK_CACHE_LIMIT = 256
+
+
+def shape_masks(shape):
+    """Преобразование фигуры (список строк) в кортеж битовых масок строк."""
+    entry = _mask_cache.get(id(shape))
+    if entry is not None and entry[0] is shape:
+        return entry[1]
+    masks = tuple(
+        sum(1 << j for j, cell in enumerate(row) if cell) for row in shape)
+    if len(_mask_cache) >= _MASK_CACHE_LIMIT:
+        _mask_cache.clear()
+    _mask_cache[id(shape)] = (shape, masks)
+    return masks
+
+
+class BitBoard:
+    """Игровое поле, где каждая строка хранится как целое число.
+
+    Бит j строки соответствует столбцу j, поэтому проверка столкновения -
+    это несколько AND, размещение фигуры - OR, а заполненная строка
+    равна FULL_MASK.
+    """
+
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT):
+        self.width = width
+        self.height = height
+        self.full_mask = (1 << width) - 1
+        self.rows = [0] * height
+        self.version = 0  # Увеличивается при каждом изменении поля
+        self._view = None
+        self._columns = None
+        self._columns_version = -1
+
+    @property
+    def grid(self):
+        """Совместимое с Grid представление в виде списка списков."""
+        if self._view is None:
+            width = self.width
+            self._view = [[(row >> x) & 1 for x in range(width)]
+                          for row in self.rows]
+        return self._view
+
+    @grid.setter
+    def grid(self, value):
+        self.set_rows([sum(1 << x for x, cell in enumerate(row) if cell)
+                       for row in value])
+
+    def set_rows(self, rows):
+        """Замена всего поля списком масок строк."""
+        self.rows = list(rows)
+        self.version += 1
+        self._view = None
+
+    def clear_lines(self):
+        full_mask = self.full_mask
+        new_rows = [row for row in self.rows if row != full_mask]
+        num_cleared_lines = self.height - len(new_rows)
+        if num_cleared_lines:
+            self.rows = [0] * num_cleared_lines + new_rows
+            self.version += 1
+            self._view = None
+        return num_cleared_lines
+
+    def place_shape(self, shape, x, y):
+        self.place_masks(shape_masks(shape), x, y)
+
+    def place_masks(self, masks, x, y):
+        rows = self.rows
+        # Маски столбцов актуальны - обновляем их вместе со строками
+        columns = self._columns if self._columns_version == self.version else None
+        for i, mask in enumerate(masks):
+            if mask:
+                shifted = mask << x if x >= 0 else mask >> -x
+                rows[y + i] |= shifted
+                if columns is not None:
+                    while shifted:
+                        low = shifted & -shifted
+                        columns[low.bit_length() - 1] |= 1 << (y + i)
+                        shifted ^= low
+        self.version += 1
+        if columns is not None:
+            self._columns_version = self.version
+        self._view = None
+
+    def valid_move(self, shape, x, y):
+        return self.valid_masks(shape_masks(shape), x, y)
+
+    def valid_masks(self, masks, x, y):
+        rows = self.rows
+        height = self.height
+        full_mask = self.full_mask
+        for i, mask in enumerate(masks):
+            if not mask:
+                continue
+            if x >= 0:
+                shifted = mask << x
+                if shifted & ~full_mask:
+                    return False
+            else:
+                if mask & ((1 << -x) - 1):
+                    return False
+                shifted = mask >> -x
+            row = y + i
+            if row >= height:
+                return False
+            if row >= 0 and rows[row] & shifted:
+                return False
+        return True
+
+    def columns(self):
+        """Маски столбцов: бит r столбца x установлен, если клетка (x, r) занята."""
+        if self._columns_version != self.version:
+            columns = [0] * self.width
+            for r, row in enumerate(self.rows):
+                while row:
+                    low = row & -row
+                    columns[low.bit_length() - 1] |= 1 << r
+                    row ^= low
+            self._columns = columns
+            self._columns_version = self.version
+        return self._columns
+
+    def landing_y(self, piece, x, y):
+        """Строка, в которой остановится фигура, падая из позиции (x, y).
+
+        Для каждого столбца фигуры ищется первая занятая клетка ниже ее
+        нижней клетки (профиль piece.bottom), поэтому фигура, задвинутая
+        под навес, тоже приземляется правильно.
+        """
+        columns = self.columns()
+        landing = self.height
+        for j, bottom in enumerate(piece.bottom):
+            if bottom < 0:
+                continue
+            start = y + bottom + 1
+            below = columns[x + j] >> start
+            if below:
+                first_filled = start + (below & -below).bit_length() - 1
+            else:
+                first_filled = self.height
+            landing = min(landing, first_filled - 1 - bottom)
+        return landing
@@ -4,6 +4,8 @@ SCREEN_HEIGHT = 600
 GRID_SIZE = 30
 GRID_WIDTH = 10
 GRID_HEIGHT = 20
+INFO_PANEL_WIDTH = 350  # Ширина боковой панели справа от поля
+MAX_FRAME_MS = 250  # Больше этого за один кадр симуляция не догоняет
 
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
@@ -0,0 +1,329 @@
+# engine.py
+
+from .bag import PieceBag
+from .bitboard import BitBoard
+from .pieces import piece_by_id
+from .varint import encode_varint, decode_varint
+from .settings import global_settings
+from .constants import *
+
+# Клавиши, которые действуют, пока удерживаются (с автоповтором)
+INPUT_LEFT = 1 << 0
+INPUT_RIGHT = 1 << 1
+INPUT_DOWN = 1 << 2
+# Однократные действия, срабатывающие в том шаге, в котором переданы
+INPUT_ROTATE = 1 << 3
+INPUT_HARD_DROP = 1 << 4
+INPUT_HOLD = 1 << 5
+# Сдвиг на одну клетку без автоповтора и опускание до места приземления
+# без фиксации - точные действия для ИИ и записанных партий
+INPUT_SHIFT_LEFT = 1 << 6
+INPUT_SHIFT_RIGHT = 1 << 7
+INPUT_SONIC_DROP = 1 << 8
+
+HELD_INPUTS = INPUT_LEFT | INPUT_RIGHT | INPUT_DOWN
+
+# Числовые поля состояния, которые сохраняются в снимок (см. snapshot)
+SNAPSHOT_FIELDS = (
+    "current_x", "current_y", "held_used", "game_over", "score",
+    "lines_cleared", "level", "pieces_placed", "fall_time",
+    "move_time_horizontal", "move_time_vertical",
+    "initial_move_delay_horizontal", "accelerated_move_delay_horizontal",
+    "initial_move_delay_vertical", "accelerated_move_delay_vertical",
+    "acceleration_threshold",
+)
+_BOOL_FIELDS = ("held_used", "game_over")
+
+
+class TetrisEngine:
+    """Правила игры без зависимости от pygame.
+
+    Состояние меняется только через step(inputs, dt_ms), где inputs -
+    битовая маска INPUT_*, а dt_ms - время в миллисекундах, прошедшее с
+    предыдущего шага.
+    """
+
+    grid_class = BitBoard
+
+    def __init__(
+            self,
+            initial_move_delay_horizontal=global_settings["initial_move_delay_horizontal"],
+            accelerated_move_delay_horizontal=global_settings["accelerated_move_delay_horizontal"],
+            initial_move_delay_vertical=global_settings["initial_move_delay_vertical"],
+            accelerated_move_delay_vertical=global_settings["accelerated_move_delay_vertical"],
+            acceleration_threshold=global_settings["acceleration_threshold"],
+            seed=None):
+        self.grid = self.grid_class(GRID_WIDTH, GRID_HEIGHT)
+        self.bag = PieceBag(seed)  # Свой генератор, чтобы партию можно было повторить
+        self.seed = self.bag.seed
+        # Фигуры выдаются по порядку, поэтому очередь next_shapes - это
+        # всегда три последние выданные фигуры (bag.position - 3 ... - 1)
+        self.current_shape = self.get_next_shape()
+        self.next_shapes = [self.get_next_shape() for _ in range(3)]
+        self.current_x = GRID_WIDTH // 2 - \
+            len(self.current_shape.shape[0]) // 2
+        self.current_y = 0
+        self.held_shape = None
+        self.held_color = None
+        self.held_used = False
+        self.game_over = False
+        self.fall_time = 0
+        self.move_time_horizontal = 0
+        self.move_time_vertical = 0
+        self.initial_move_delay_horizontal = initial_move_delay_horizontal
+        self.accelerated_move_delay_horizontal = accelerated_move_delay_horizontal
+        self.initial_move_delay_vertical = initial_move_delay_vertical
+        self.accelerated_move_delay_vertical = accelerated_move_delay_vertical
+        self.acceleration_threshold = acceleration_threshold
+        self.score = 0
+        self.level = 1
+        self.lines_cleared = 0
+        self.pieces_placed = 0
+        self._landing_key = None
+        self._landing_from = 0  # Строка, от которой посчитан _landing_y
+        self._landing_y = 0
+        self.recorder = None  # game.replay.ReplayRecorder, если партия записывается
+        self.input_listener = None  # Вызывается с входами каждого шага (network.authority.InputSender)
+
+    def get_next_shape(self):
+        return self.bag.next()
+
+    def snapshot(self):
+        """Полное состояние партии в компактном двоичном виде."""
+        data = bytearray()
+        encode_varint(self.bag.seed, data)
+        encode_varint(self.bag.position, data)
+        encode_varint(self.current_shape.id, data)
+        encode_varint(0 if self.held_shape is None else self.held_shape.id + 1, data)
+        for field in SNAPSHOT_FIELDS:
+            encode_varint(int(getattr(self, field)), data)
+        encode_varint(len(self.grid.rows), data)
+        for row in self.grid.rows:
+            encode_varint(row, data)
+        return bytes(data)
+
+    def restore(self, data, offset=0):
+        """Восстановление состояния из snapshot(); возвращает позицию за снимком."""
+        seed, offset = decode_varint(data, offset)
+        position, offset = decode_varint(data, offset)
+        current_id, offset = decode_varint(data, offset)
+        held_id, offset = decode_varint(data, offset)
+        for field in SNAPSHOT_FIELDS:
+            value, offset = decode_varint(data, offset)
+            setattr(self, field, bool(value) if field in _BOOL_FIELDS else value)
+        count, offset = decode_varint(data, offset)
+        rows = []
+        for _ in range(count):
+            row, offset = decode_varint(data, offset)
+            rows.append(row)
+        self.grid.set_rows(rows)
+        if self.bag.seed != seed:
+            self.bag = PieceBag(seed)
+            self.seed = seed
+        self.bag.position = position
+        self.next_shapes = [self.bag.at(position - i) for i in range(3, 0, -1)]
+        self.current_shape = piece_by_id(current_id)
+        self.held_shape = None if held_id == 0 else piece_by_id(held_id - 1)
+        self.held_color = None if self.held_shape is None else self.held_shape.color
+        self._landing_key = None
+        return offset
+
+    def step(self, inputs, dt_ms):
+        """Один шаг симуляции: действия, автоповтор клавиш и гравитация."""
+        if self.game_over:
+            return
+        if self.recorder is not None:
+            self.recorder.record(inputs, dt_ms)
+        if self.input_listener is not None:
+            self.input_listener(inputs, dt_ms)
+        if inputs & INPUT_ROTATE:
+            self.rotate()
+        if inputs & INPUT_SHIFT_LEFT:
+            self.shift(-1)
+        if inputs & INPUT_SHIFT_RIGHT:
+            self.shift(1)
+        if inputs & INPUT_SONIC_DROP:
+            self.current_y = self.landing_y()
+        if inputs & INPUT_HARD_DROP:
+            self.hard_drop()
+            if self.game_over:
+                return
+        if inputs & INPUT_HOLD:
+            self.hold()
+        self.handle_held_inputs(inputs, dt_ms)
+        self.update_falling_shape()
+
+    def advance(self, inputs, ticks, tick_ms):
+        """ticks шагов по tick_ms: однократные действия из inputs - в первом,
+        удерживаемые клавиши - во всех.
+
+        Результат тот же, что у цикла step, но шаги без удерживаемых клавиш
+        до срабатывания гравитации только копят время и пропускаются разом.
+        """
+        if ticks <= 0:
+            return
+        self.step(inputs, tick_ms)
+        inputs &= HELD_INPUTS
+        ticks -= 1
+        if inputs or self.recorder is not None or self.input_listener is not None:
+            for _ in range(ticks):
+                self.step(inputs, tick_ms)
+            return
+        while ticks > 0 and not self.game_over:
+            skip = min(ticks, self._ticks_to_fall(tick_ms)) - 1
+            if skip > 0:
+                elapsed = skip * tick_ms
+                self.move_time_horizontal += elapsed
+                self.move_time_vertical += elapsed
+                self.fall_time += elapsed
+                ticks -= skip
+            self.step(0, tick_ms)
+            ticks -= 1
+
+    def _ticks_to_fall(self, tick_ms):
+        """Номер шага (от 1), в котором сработает гравитация, если клавиш нет."""
+        fall_time = self.fall_time
+        ticks = max(1, int((1000 / self.level - fall_time) // tick_ms))
+        # Подгонка под то же сравнение, что в update_falling_shape
+        while ticks > 1 and (fall_time + (ticks - 1) * tick_ms) / 1000 >= (1 / self.level):
+            ticks -= 1
+        while (fall_time + ticks * tick_ms) / 1000 < (1 / self.level):
+            ticks += 1
+        return ticks
+
+    def rotate(self):
+        rotated_shape = self.current_shape.rotate()
+        if self.grid.valid_move(
+                rotated_shape.shape,
+                self.current_x,
+                self.current_y):
+            self.current_shape = rotated_shape
+
+    def shift(self, dx):
+        if self.grid.valid_move(
+                self.current_shape.shape,
+                self.current_x + dx,
+                self.current_y):
+            self.current_x += dx
+
+    def hard_drop(self):
+        self.current_y = self.landing_y()
+        self.lock_current_shape()
+
+    def landing_y(self):
+        """Строка приземления текущей фигуры (для сброса и тени).
+
+        Результат кэшируется по (фигура, x, версия поля) и строке, от которой
+        посчитан: пока фигура только опускается, он не меняется. Фигура выше
+        этой строки (после hold или появления новой) могла бы приземлиться
+        на навес, поэтому для нее строка считается заново.
+        """
+        key = (self.current_shape.id, self.current_x, self.grid.version)
+        y = self.current_y
+        if key != self._landing_key or not self._landing_from <= y <= self._landing_y:
+            self._landing_key = key
+            self._landing_from = y
+            self._landing_y = self.grid.landing_y(
+                self.current_shape, self.current_x, self.current_y)
+        return self._landing_y
+
+    def hold(self):
+        if self.held_used:
+            return
+        if self.held_shape is None:
+            self.held_shape = self.current_shape
+            self.held_color = self.current_shape.color
+            self.spawn_new_shape()
+        else:
+            self.held_shape, self.current_shape = self.current_shape, self.held_shape
+            self.held_color = self.held_shape.color
+        self.current_x = GRID_WIDTH // 2 - \
+            len(self.current_shape.shape[0]) // 2
+        self.current_y = 0
+        self.held_used = True
+
+    def handle_held_inputs(self, inputs, time_passed):
+        horizontal_move_delay = self.initial_move_delay_horizontal
+        vertical_move_delay = self.initial_move_delay_vertical
+        if inputs & INPUT_LEFT:
+            if self.grid.valid_move(
+                    self.current_shape.shape,
+                    self.current_x - 1,
+                    self.current_y):
+                if self.move_time_horizontal == 0 or self.move_time_horizontal >= horizontal_move_delay:
+                    self.current_x -= 1
+                    self.move_time_horizontal = 0
+                if self.move_time_horizontal >= self.acceleration_threshold:
+                    horizontal_move_delay = self.accelerated_move_delay_horizontal
+        if inputs & INPUT_RIGHT:
+            if self.grid.valid_move(
+                    self.current_shape.shape,
+                    self.current_x + 1,
+                    self.current_y):
+                if self.move_time_horizontal == 0 or self.move_time_horizontal >= horizontal_move_delay:
+                    self.current_x += 1
+                    self.move_time_horizontal = 0
+                if self.move_time_horizontal >= self.acceleration_threshold:
+                    horizontal_move_delay = self.accelerated_move_delay_horizontal
+        if inputs & INPUT_DOWN:
+            if self.grid.valid_move(
+                    self.current_shape.shape,
+                    self.current_x,
+                    self.current_y + 1):
+                if self.move_time_vertical == 0 or self.move_time_vertical >= vertical_move_delay:
+                    self.current_y += 1
+                    self.move_time_vertical = 0
+                if self.move_time_vertical >= self.acceleration_threshold:
+                    vertical_move_delay = self.accelerated_move_delay_vertical
+        self.move_time_horizontal += time_passed
+        self.move_time_vertical += time_passed
+        self.fall_time += time_passed
+
+    def place_current_shape(self):
+        self.grid.place_shape(
+            self.current_shape.shape,
+            self.current_x,
+            self.current_y)
+        self.pieces_placed += 1
+
+    def lock_current_shape(self):
+        """Фиксация фигуры, очистка линий и появление следующей."""
+        self.place_current_shape()
+        self.clear_lines()
+        self.spawn_new_shape()
+        if not self.grid.valid_move(
+                self.current_shape.shape,
+                self.current_x,
+                self.current_y):
+            self.game_over = True
+
+    def clear_lines(self):
+        lines_cleared = self.grid.clear_lines()
+        if lines_cleared > 0:
+            self.score += SCORE_TABLE.get(lines_cleared, 0)
+            self.lines_cleared += lines_cleared
+            # Увеличиваем уровень каждые 10 очищенных линий
+            if self.lines_cleared >= self.level * 10:
+                self.level += 1
+                self.initial_move_delay_vertical = max(
+                    50, self.initial_move_delay_vertical - 20)  # Увеличиваем скорость
+
+    def spawn_new_shape(self):
+        self.current_shape = self.next_shapes.pop(0)
+        self.next_shapes.append(self.get_next_shape())
+        self.current_x = GRID_WIDTH // 2 - \
+            len(self.current_shape.shape[0]) // 2
+        self.current_y = 0
+        self.held_used = False
+
+    def update_falling_shape(self):
+        if self.fall_time / \
+                1000 >= (1 / self.level):  # Регулируем скорость падения в зависимости от уровня
+            if self.grid.valid_move(
+                    self.current_shape.shape,
+                    self.current_x,
+                    self.current_y + 1):
+                self.current_y += 1
+            else:
+                self.lock_current_shape()
+            self.fall_time = 0
@@ -2,9 +2,39 @@
 
 import pygame
 
+from .bitboard import BitBoard
 from .constants import *
 
 
+def draw_cells(screen, grid, x_offset=0):
+    """Отрисовка поля, заданного списком списков."""
+    for y, row in enumerate(grid):
+        for x, cell in enumerate(row):
+            color = BLACK if cell == 0 else WHITE
+            pygame.draw.rect(
+                screen,
+                color,
+                (x *
+                 GRID_SIZE +
+                 x_offset,
+                 y *
+                 GRID_SIZE,
+                 GRID_SIZE,
+                 GRID_SIZE),
+                0)
+            pygame.draw.rect(
+                screen,
+                GRAY,
+                (x *
+                 GRID_SIZE +
+                 x_offset,
+                 y *
+                 GRID_SIZE,
+                 GRID_SIZE,
+                 GRID_SIZE),
+                1)
+
+
 class Grid:
     def __init__(self, width, height):
         self.width = width
@@ -35,28 +65,11 @@ class Grid:
         return True
 
     def draw(self, screen, x_offset=0):
-        for y, row in enumerate(self.grid):
-            for x, cell in enumerate(row):
-                color = BLACK if cell == 0 else WHITE
-                pygame.draw.rect(
-                    screen,
-                    color,
-                    (x *
-                     GRID_SIZE +
-                     x_offset,
-                     y *
-                     GRID_SIZE,
-                     GRID_SIZE,
-                     GRID_SIZE),
-                    0)
-                pygame.draw.rect(
-                    screen,
-                    GRAY,
-                    (x *
-                     GRID_SIZE +
-                     x_offset,
-                     y *
-                     GRID_SIZE,
-                     GRID_SIZE,
-                     GRID_SIZE),
-                    1)
+        draw_cells(screen, self.grid, x_offset)
+
+
+class BitGrid(BitBoard):
+    """Поле на битовых масках с тем же API, что и Grid."""
+
+    def draw(self, screen, x_offset=0):
+        draw_cells(screen, self.grid, x_offset)
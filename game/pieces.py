@@ -0,0 +1,85 @@
+# pieces.py
+
+from .constants import SHAPES, SHAPE_COLORS
+
+
+class Piece:
+    """Неизменяемая фигура в одном из четырех поворотов.
+
+    Все экземпляры создаются один раз при импорте модуля и хранятся в
+    таблице PIECES, поэтому поворот и появление новой фигуры сводятся к
+    поиску в таблице без выделения памяти.
+    """
+
+    __slots__ = ("id", "name", "rotation", "shape", "color", "cells",
+                 "width", "height", "bottom", "masks", "_rotated")
+
+    def __init__(self, piece_id, name, rotation, shape, color):
+        shape = tuple(tuple(row) for row in shape)
+        cells = tuple((j, i) for i, row in enumerate(shape)
+                      for j, cell in enumerate(row) if cell)
+        width = len(shape[0])
+        set_attr = object.__setattr__
+        set_attr(self, "id", piece_id)
+        set_attr(self, "name", name)
+        set_attr(self, "rotation", rotation)
+        set_attr(self, "shape", shape)
+        set_attr(self, "color", color)
+        set_attr(self, "cells", cells)
+        set_attr(self, "width", width)
+        set_attr(self, "height", len(shape))
+        # Нижняя занятая клетка в каждом столбце (-1, если столбец пуст)
+        set_attr(self, "bottom", tuple(
+            max((i for j, i in cells if j == column), default=-1)
+            for column in range(width)))
+        set_attr(self, "masks", tuple(
+            sum(1 << j for j, cell in enumerate(row) if cell) for row in shape))
+        set_attr(self, "_rotated", None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Фигура {self.name} неизменяема")
+
+    def __reduce__(self):
+        # При распаковке возвращаем экземпляр из таблицы, а не копию
+        return piece_by_id, (self.id,)
+
+    def __repr__(self):
+        return f"Piece({self.name!r}, rotation={self.rotation})"
+
+    def rotate(self):
+        return self._rotated
+
+
+def _rotate_rows(shape):
+    return [list(reversed(col)) for col in zip(*shape)]
+
+
+def _build_tables():
+    pieces = {}
+    piece_list = []
+    for name, shape in SHAPES.items():
+        rotations = []
+        for rotation in range(4):
+            piece = Piece(len(piece_list), name, rotation,
+                          shape, SHAPE_COLORS[name])
+            rotations.append(piece)
+            piece_list.append(piece)
+            shape = _rotate_rows(shape)
+        for rotation, piece in enumerate(rotations):
+            object.__setattr__(
+                piece, "_rotated", rotations[(rotation + 1) % 4])
+        pieces[name] = tuple(rotations)
+    return pieces, tuple(piece_list)
+
+
+# PIECES[name][rotation] и PIECE_LIST[piece.id] - одни и те же объекты
+PIECES, PIECE_LIST = _build_tables()
+PIECE_NAMES = tuple(PIECES)
+
+
+def get_piece(name, rotation=0):
+    return PIECES[name][rotation % 4]
+
+
+def piece_by_id(piece_id):
+    return PIECE_LIST[piece_id]
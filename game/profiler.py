@@ -0,0 +1,129 @@
+# profiler.py
+
+import csv
+import os
+import time
+from collections import deque
+from time import perf_counter_ns
+
+import pygame
+
+from .constants import *
+from .text import get_font
+
+OVERLAY_REFRESH = 15  # Обновление оверлея раз в N кадров
+OVERLAY_FONT_SIZE = 20
+
+
+class FrameProfiler:
+    """Замер времени фаз кадра через perf_counter_ns.
+
+    Цикл вызывает start_frame, затем mark(фаза) после каждой фазы и
+    end_frame. В выключенном состоянии каждый вызов - одна проверка
+    флага. Строки кадров копятся в памяти и пишутся в CSV методом save.
+    """
+
+    def __init__(self, enabled=False, window=300):
+        self.enabled = enabled
+        self.phases = []  # Фазы в порядке первого появления
+        self.rows = []  # Время фаз каждого кадра, нс
+        self.history = deque(maxlen=window)
+        self.frame = {}
+        self.last = 0
+        self.overlay_visible = False
+        self.overlay = None  # Поверхность оверлея
+        self.overlay_rect = None  # Где оверлей нарисован на экране
+
+    def start_frame(self):
+        if not self.enabled:
+            return
+        self.frame = {}
+        self.last = perf_counter_ns()
+
+    def mark(self, phase):
+        """Время с предыдущей отметки засчитывается фазе phase."""
+        if not self.enabled:
+            return
+        now = perf_counter_ns()
+        frame = self.frame
+        if phase not in frame:
+            frame[phase] = 0
+            if phase not in self.phases:
+                self.phases.append(phase)
+        frame[phase] += now - self.last
+        self.last = now
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        self.rows.append(self.frame)
+        self.history.append(self.frame)
+
+    def toggle_overlay(self):
+        if self.enabled:
+            self.overlay_visible = not self.overlay_visible
+
+    def stats(self):
+        """(фаза, текущее, среднее, p99) в миллисекундах по последним кадрам."""
+        result = []
+        for phase in self.phases + ["total"]:
+            if phase == "total":
+                values = sorted(sum(frame.values()) for frame in self.history)
+                current = sum(self.history[-1].values()) if self.history else 0
+            else:
+                values = sorted(frame.get(phase, 0) for frame in self.history)
+                current = self.history[-1].get(phase, 0) if self.history else 0
+            if not values:
+                continue
+            p99 = values[min(len(values) - 1, int(len(values) * 0.99))]
+            result.append((phase, current / 1e6,
+                           sum(values) / len(values) / 1e6, p99 / 1e6))
+        return result
+
+    def draw_overlay(self, screen):
+        """Отрисовка оверлея в правом верхнем углу; возвращает измененные прямоугольники."""
+        if not self.overlay_visible:
+            if self.overlay_rect is None:
+                return []
+            # Оверлей только что скрыт: стираем его
+            rect, self.overlay_rect = self.overlay_rect, None
+            self.overlay = None
+            screen.fill(BLACK, rect)
+            return [rect]
+        if self.overlay is None or len(self.rows) % OVERLAY_REFRESH == 0:
+            font = get_font(OVERLAY_FONT_SIZE)
+            lines = [f"{'фаза':<9}{'тек':>6}{'сред':>6}{'p99':>6}"]
+            lines += [f"{phase:<9}{current:>6.2f}{average:>6.2f}{p99:>6.2f}"
+                      for phase, current, average, p99 in self.stats()]
+            height = font.get_linesize()
+            self.overlay = pygame.Surface((200, height * len(lines) + 10))
+            self.overlay.fill(BLACK)
+            for i, line in enumerate(lines):
+                self.overlay.blit(font.render(line, True, WHITE), (5, 5 + i * height))
+        elif self.overlay_rect is not None:
+            return []
+        rects = []
+        if self.overlay_rect is not None:
+            screen.fill(BLACK, self.overlay_rect)
+            rects.append(self.overlay_rect)
+        self.overlay_rect = screen.blit(
+            self.overlay, (SCREEN_WIDTH - self.overlay.get_width(), 0))
+        rects.append(self.overlay_rect)
+        return rects
+
+    def save(self, directory, prefix="frames"):
+        """Запись строк кадров в CSV; возвращает путь или None, если писать нечего."""
+        if not self.rows:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(
+            directory, f"{prefix}_{time.strftime('%Y%m%d_%H%M%S')}.csv")
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["frame"] + [f"{phase}_ns" for phase in self.phases]
+                            + ["total_ns"])
+            for number, frame in enumerate(self.rows):
+                values = [frame.get(phase, 0) for phase in self.phases]
+                writer.writerow([number] + values + [sum(values)])
+        self.rows = []
+        return path
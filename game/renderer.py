@@ -0,0 +1,94 @@
+# renderer.py
+
+import pygame
+
+from .atlas import TILE_GHOST, TILE_LOCKED, TILE_PIECE, get_atlas
+from .constants import *
+
+
+class BoardRenderer:
+    """Отрисовка поля с обновлением только изменившихся клеток.
+
+    Пустое поле с линиями сетки рисуется один раз в фоновую поверхность.
+    Каждый кадр сравнивает занятые строки и клетки фигуры и тени с
+    предыдущим кадром, перерисовывает только отличающиеся клетки и
+    возвращает их прямоугольники для pygame.display.update.
+    """
+
+    def __init__(self, x_offset=0, width=GRID_WIDTH, height=GRID_HEIGHT):
+        self.x_offset = x_offset
+        self.width = width
+        self.height = height
+        self.background = pygame.Surface((width * GRID_SIZE, height * GRID_SIZE))
+        self.background.fill(BLACK)
+        for y in range(height):
+            for x in range(width):
+                pygame.draw.rect(
+                    self.background, GRAY,
+                    (x * GRID_SIZE, y * GRID_SIZE, GRID_SIZE, GRID_SIZE), 1)
+        self.atlas = get_atlas()
+        self.rows = None  # Строки поля, нарисованные в прошлом кадре
+        self.overlay = {}  # (x, y) -> (цвет, вид клетки) фигуры и тени
+
+    def invalidate(self):
+        """Следующий кадр будет нарисован целиком (например, после очистки экрана)."""
+        self.rows = None
+        self.overlay = {}
+
+    def render(self, screen, rows, piece=None, x=0, y=0, ghost_y=None):
+        """Перерисовка изменившихся клеток; возвращает список dirty-прямоугольников."""
+        overlay = {}
+        if piece is not None:
+            if ghost_y is not None:
+                for j, i in piece.cells:
+                    overlay[(x + j, ghost_y + i)] = (piece.color, TILE_GHOST)
+            for j, i in piece.cells:
+                overlay[(x + j, y + i)] = (piece.color, TILE_PIECE)
+
+        # Грязные клетки по строкам: битовая маска столбцов для каждой строки
+        dirty = [0] * self.height
+        if self.rows is None:
+            dirty = [(1 << self.width) - 1] * self.height
+        else:
+            for r, (old, new) in enumerate(zip(self.rows, rows)):
+                dirty[r] = old ^ new
+        previous = self.overlay
+        for cell, value in overlay.items():
+            if previous.get(cell) != value and 0 <= cell[1] < self.height:
+                dirty[cell[1]] |= 1 << cell[0]
+        for cell, value in previous.items():
+            if cell not in overlay and 0 <= cell[1] < self.height:
+                dirty[cell[1]] |= 1 << cell[0]
+        self.rows = list(rows)
+        self.overlay = overlay
+
+        rects = []
+        blits = []
+        atlas = self.atlas.surface
+        areas = self.atlas.areas
+        locked = areas[(WHITE, TILE_LOCKED)]
+        for r, mask in enumerate(dirty):
+            if not mask:
+                continue
+            first = (mask & -mask).bit_length() - 1
+            last = mask.bit_length() - 1
+            row = rows[r]
+            top = r * GRID_SIZE
+            for c in range(first, last + 1):
+                if not mask >> c & 1:
+                    continue
+                left = c * GRID_SIZE
+                position = (left + self.x_offset, top)
+                if row >> c & 1:
+                    blits.append((atlas, position, locked))
+                else:
+                    blits.append((self.background, position,
+                                  (left, top, GRID_SIZE, GRID_SIZE)))
+                value = overlay.get((c, r))
+                if value is not None:
+                    blits.append((atlas, position, areas[value]))
+            rects.append(pygame.Rect(
+                first * GRID_SIZE + self.x_offset, top,
+                (last - first + 1) * GRID_SIZE, GRID_SIZE))
+        screen.blits(blits, doreturn=False)
+        return rects
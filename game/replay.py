@@ -0,0 +1,348 @@
+# replay.py
+
+import mmap
+import os
+import struct
+import time
+from bisect import bisect_right
+
+from .engine import TetrisEngine
+from .varint import encode_varint, decode_varint
+
+# Формат файла записи (версия 2):
+#   заголовок: MAGIC, байт версии, varint seed, 5 varint начальных задержек,
+#              varint интервала ключевых кадров (в фигурах)
+#   события:   varint повторов (>= 1), varint dt_ms, varint входов
+#   служебная запись: varint 0, байт типа и данные:
+#     RECORD_KEYFRAME - varint длины и снимок TetrisEngine.snapshot()
+#     RECORD_END      - конец событий
+#   итог:      varint очков, линий, фигур, уровня, числа строк и масок строк
+#   индекс:    varint числа записей, затем для каждого ключевого кадра
+#              varint времени (мс), фигур, номера шага и смещения записи
+#   хвост:     смещение индекса (uint32, little-endian) и INDEX_MAGIC
+MAGIC = b"TRPL"
+INDEX_MAGIC = b"TIDX"
+VERSION = 2
+RECORD_END = 0
+RECORD_KEYFRAME = 1
+
+_TAIL = struct.Struct("<I4s")
+
+SETTINGS_FIELDS = (
+    "initial_move_delay_horizontal",
+    "accelerated_move_delay_horizontal",
+    "initial_move_delay_vertical",
+    "accelerated_move_delay_vertical",
+    "acceleration_threshold",
+)
+
+FINAL_FIELDS = ("score", "lines", "pieces", "level")
+
+
+class ReplayError(Exception):
+    pass
+
+
+class KeyframeEntry:
+    __slots__ = ("time_ms", "pieces", "step", "offset")
+
+    def __init__(self, time_ms, pieces, step, offset):
+        self.time_ms = time_ms
+        self.pieces = pieces
+        self.step = step
+        self.offset = offset
+
+
+class ReplayRecorder:
+    """Запись партии как seed и сжатый журнал входов TetrisEngine.step.
+
+    Одинаковые подряд шаги (dt и входы) сворачиваются в один счетчик
+    повторов, поэтому простой без нажатий почти не занимает места. Каждые
+    keyframe_interval фигур в журнал добавляется снимок состояния, чтобы
+    запись можно было перематывать.
+    """
+
+    def __init__(self, engine, keyframe_interval=20):
+        self.engine = engine
+        self.keyframe_interval = keyframe_interval
+        self.data = bytearray(MAGIC)
+        self.data.append(VERSION)
+        encode_varint(engine.seed, self.data)
+        for field in SETTINGS_FIELDS:
+            encode_varint(getattr(engine, field), self.data)
+        encode_varint(keyframe_interval, self.data)
+        self.last = None
+        self.run = 0
+        self.time_ms = 0
+        self.steps = 0
+        self.index = []
+        self.next_keyframe = 0
+
+    def record(self, inputs, dt_ms):
+        if self.keyframe_interval and \
+                self.engine.pieces_placed >= self.next_keyframe:
+            self._keyframe()
+        self.time_ms += dt_ms
+        self.steps += 1
+        step = (dt_ms, inputs)
+        if step == self.last:
+            self.run += 1
+            return
+        self._flush()
+        self.last = step
+        self.run = 1
+
+    def _keyframe(self):
+        self._flush()
+        self.last = None
+        pieces = self.engine.pieces_placed
+        self.index.append(KeyframeEntry(
+            self.time_ms, pieces, self.steps, len(self.data)))
+        snapshot = self.engine.snapshot()
+        encode_varint(0, self.data)
+        self.data.append(RECORD_KEYFRAME)
+        encode_varint(len(snapshot), self.data)
+        self.data.extend(snapshot)
+        self.next_keyframe = pieces + self.keyframe_interval
+
+    def _flush(self):
+        if self.run:
+            encode_varint(self.run, self.data)
+            encode_varint(self.last[0], self.data)
+            encode_varint(self.last[1], self.data)
+            self.run = 0
+
+    def finish(self, engine=None):
+        """Завершение записи; возвращает содержимое файла."""
+        engine = self.engine if engine is None else engine
+        self._flush()
+        encode_varint(0, self.data)
+        self.data.append(RECORD_END)
+        for value in (engine.score, engine.lines_cleared,
+                      engine.pieces_placed, engine.level):
+            encode_varint(value, self.data)
+        encode_varint(len(engine.grid.rows), self.data)
+        for row in engine.grid.rows:
+            encode_varint(row, self.data)
+        index_offset = len(self.data)
+        encode_varint(len(self.index), self.data)
+        for entry in self.index:
+            for value in (entry.time_ms, entry.pieces, entry.step, entry.offset):
+                encode_varint(value, self.data)
+        self.data.extend(_TAIL.pack(index_offset, INDEX_MAGIC))
+        return bytes(self.data)
+
+    def save(self, engine, directory, prefix="game"):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(
+            directory, f"{prefix}_{time.strftime('%Y%m%d_%H%M%S')}_{engine.seed}.trpl")
+        with open(path, "wb") as file:
+            file.write(self.finish(engine))
+        return path
+
+
+class Replay:
+    """Запись партии поверх байтов файла (bytes или mmap).
+
+    События не разбираются заранее: шаги декодируются по мере прогона,
+    а перемотка начинается с ближайшего ключевого кадра из индекса.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        if data[:4] != MAGIC:
+            raise ReplayError("Это не файл записи партии")
+        self.version = data[4]
+        if self.version != VERSION:
+            raise ReplayError(f"Неподдерживаемая версия записи: {self.version}")
+        offset = 5
+        self.seed, offset = decode_varint(data, offset)
+        self.settings = {}
+        for field in SETTINGS_FIELDS:
+            self.settings[field], offset = decode_varint(data, offset)
+        self.keyframe_interval, offset = decode_varint(data, offset)
+        self.events_offset = offset
+        self.index = self._read_index()
+        self._final = None
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(data)
+
+    @classmethod
+    def load(cls, path):
+        """Открытие файла через mmap: читаются только нужные страницы."""
+        with open(path, "rb") as file:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(data)
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+    def _read_index(self):
+        data = self.data
+        if len(data) < _TAIL.size:
+            raise ReplayError("Запись обрезана: нет индекса")
+        index_offset, magic = _TAIL.unpack_from(data, len(data) - _TAIL.size)
+        if magic != INDEX_MAGIC:
+            raise ReplayError("Запись обрезана: нет индекса")
+        count, offset = decode_varint(data, index_offset)
+        index = []
+        for _ in range(count):
+            values = []
+            for _ in range(4):
+                value, offset = decode_varint(data, offset)
+                values.append(value)
+            index.append(KeyframeEntry(*values))
+        return index
+
+    def records(self, offset=None):
+        """Записи журнала начиная с offset.
+
+        Возвращает кортежи ("steps", повторы, dt_ms, входы),
+        ("keyframe", смещение снимка, длина снимка, смещение записи) и
+        ("end", смещение итога).
+        """
+        data = self.data
+        offset = self.events_offset if offset is None else offset
+        while offset < len(data):
+            start = offset
+            run, offset = decode_varint(data, offset)
+            if run:
+                dt_ms, offset = decode_varint(data, offset)
+                inputs, offset = decode_varint(data, offset)
+                yield "steps", run, dt_ms, inputs
+                continue
+            kind = data[offset]
+            offset += 1
+            if kind == RECORD_KEYFRAME:
+                length, offset = decode_varint(data, offset)
+                yield "keyframe", offset, length, start
+                offset += length
+            elif kind == RECORD_END:
+                yield "end", offset
+                return
+            else:
+                raise ReplayError(f"Неизвестный тип записи: {kind}")
+
+    @property
+    def events(self):
+        """Список (повторы, dt_ms, входы) всех шагов записи."""
+        return [record[1:] for record in self.records() if record[0] == "steps"]
+
+    @property
+    def final(self):
+        """Итог партии, сохраненный в файле, или None для обрезанной записи."""
+        if self._final is None:
+            for record in self.records():
+                if record[0] == "end":
+                    self._final = self._read_final(record[1])
+        return self._final
+
+    def _read_final(self, offset):
+        data = self.data
+        final = {}
+        for field in FINAL_FIELDS:
+            final[field], offset = decode_varint(data, offset)
+        count, offset = decode_varint(data, offset)
+        rows = []
+        for _ in range(count):
+            row, offset = decode_varint(data, offset)
+            rows.append(row)
+        final["rows"] = rows
+        return final
+
+    def create_engine(self, engine_class=TetrisEngine):
+        return engine_class(seed=self.seed, **self.settings)
+
+    def steps(self, offset=None):
+        """Шаги записи по одному: (входы, dt_ms)."""
+        for record in self.records(offset):
+            if record[0] == "steps":
+                _, run, dt_ms, inputs = record
+                for _ in range(run):
+                    yield inputs, dt_ms
+
+    def run(self, engine=None):
+        """Прогон записи без отрисовки с максимальной скоростью."""
+        engine = self.create_engine() if engine is None else engine
+        step = engine.step
+        for record in self.records():
+            if record[0] == "steps":
+                _, run, dt_ms, inputs = record
+                for _ in range(run):
+                    step(inputs, dt_ms)
+        return engine
+
+    def verify(self):
+        """Сверка результата прогона с итогом, сохраненным в файле."""
+        engine = self.run()
+        result = {
+            "score": engine.score,
+            "lines": engine.lines_cleared,
+            "pieces": engine.pieces_placed,
+            "level": engine.level,
+            "rows": list(engine.grid.rows),
+        }
+        return self.final == result, result
+
+    def verify_index(self):
+        """Сверка каждого ключевого кадра с состоянием при прогоне с начала.
+
+        Возвращает список записей индекса, для которых снимок не совпал.
+        """
+        engine = self.create_engine()
+        entries = {entry.offset: entry for entry in self.index}
+        mismatched = []
+        for record in self.records():
+            if record[0] == "steps":
+                _, run, dt_ms, inputs = record
+                for _ in range(run):
+                    engine.step(inputs, dt_ms)
+            elif record[0] == "keyframe":
+                _, snapshot_offset, length, record_offset = record
+                entry = entries.pop(record_offset, None)
+                stored = bytes(self.data[snapshot_offset:snapshot_offset + length])
+                if stored != engine.snapshot() or entry is None or \
+                        entry.pieces != engine.pieces_placed:
+                    mismatched.append(entry)
+        mismatched.extend(entries.values())
+        return mismatched
+
+    def seek(self, time_ms=None, pieces=None, engine=None):
+        """Состояние партии на момент time_ms (или после pieces фигур).
+
+        Восстанавливается ближайший предшествующий ключевой кадр, затем
+        досимулируется короткий остаток журнала.
+        """
+        engine = self.create_engine() if engine is None else engine
+        if time_ms is not None:
+            keys = [entry.time_ms for entry in self.index]
+            target = time_ms
+        else:
+            keys = [entry.pieces for entry in self.index]
+            target = pieces
+        position = bisect_right(keys, target) - 1
+        offset = None
+        elapsed = 0
+        if position >= 0:
+            entry = self.index[position]
+            records = self.records(entry.offset)
+            _, snapshot_offset, _, _ = next(records)
+            engine.restore(self.data, snapshot_offset)
+            elapsed = entry.time_ms
+            offset = entry.offset
+        records = self.records(offset)
+        for record in records:
+            if record[0] != "steps":
+                continue
+            _, run, dt_ms, inputs = record
+            for _ in range(run):
+                if time_ms is not None and elapsed + dt_ms > time_ms:
+                    return engine
+                if pieces is not None and engine.pieces_placed >= pieces:
+                    return engine
+                engine.step(inputs, dt_ms)
+                elapsed += dt_ms
+        return engine
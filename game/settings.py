@@ -3,5 +3,13 @@ global_settings = {
     "accelerated_move_delay_horizontal": 10,
     "initial_move_delay_vertical": 150,
     "accelerated_move_delay_vertical": 50,
-    "acceleration_threshold": 50
+    "acceleration_threshold": 50,
+    "tick_ms": 4,  # Логический шаг симуляции (4 мс = 250 Гц)
+    "max_fps": 60,  # Ограничение частоты отрисовки, 0 - без ограничения
+    "max_state_rate": 30,  # Не больше N отправок состояния в секунду в сражении
+    "record_replays": False,  # Сохранять запись каждой партии
+    "replay_dir": "replays",
+    "replay_keyframe_interval": 20,  # Снимок состояния каждые N фигур
+    "profile_frames": False,  # Замер фаз кадра, оверлей по F3 и CSV при выходе
+    "profile_dir": "profiles"
 }
\ No newline at end of file
@@ -1,24 +1,11 @@
 # shape.py
 
-import pygame
-
+from .atlas import TILE_GHOST, TILE_PIECE, get_atlas
 from .constants import GRID_SIZE
 
 
-class Shape:
-    def __init__(self, shape, color):
-        self.shape = shape
-        self.color = color
-
-    def rotate(self):
-        return Shape([list(reversed(col))
-                     for col in zip(*self.shape)], self.color)
-
-    def draw(self, screen, x, y, alpha=255, x_offset=0):
-        surface = pygame.Surface((GRID_SIZE, GRID_SIZE), pygame.SRCALPHA)
-        surface.fill((*self.color, alpha))
-        for i, row in enumerate(self.shape):
-            for j, cell in enumerate(row):
-                if cell:
-                    screen.blit(
-                        surface, (((x + j) * GRID_SIZE) + x_offset, (y + i) * GRID_SIZE))
+def draw_shape(screen, shape, x, y, ghost=False, x_offset=0):
+    """Отрисовка фигуры в клетке (x, y) поля клетками из атласа."""
+    get_atlas().draw_cells(
+        screen, shape.cells, shape.color, TILE_GHOST if ghost else TILE_PIECE,
+        x * GRID_SIZE + x_offset, y * GRID_SIZE)
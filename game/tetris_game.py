@@ -1,59 +1,85 @@
 # tetris_game.py
 
 import pygame
-import random
 
-from .grid import Grid
-from .shape import Shape
+from .engine import *
+from .grid import BitGrid
+from .atlas import TILE_BLOCK, get_atlas
+from .profiler import FrameProfiler
+from .renderer import BoardRenderer
+from .replay import ReplayRecorder
+from .shape import draw_shape
 from .settings import global_settings
+from .text import render_text
+from .ui_loop import CONTINUE, run_ui_loop
 from .constants import *
 
 
-class TetrisGame:
+class TetrisGame(TetrisEngine):
+    """Фронтенд на pygame поверх TetrisEngine: ввод с клавиатуры и отрисовка."""
+
+    grid_class = BitGrid
+
     def __init__(
             self,
             initial_move_delay_horizontal=global_settings["initial_move_delay_horizontal"],
             accelerated_move_delay_horizontal=global_settings["accelerated_move_delay_horizontal"],
             initial_move_delay_vertical=global_settings["initial_move_delay_vertical"],
             accelerated_move_delay_vertical=global_settings["accelerated_move_delay_vertical"],
-            acceleration_threshold=global_settings["acceleration_threshold"]):
+            acceleration_threshold=global_settings["acceleration_threshold"],
+            controller=None,
+            seed=None):
+        super().__init__(
+            initial_move_delay_horizontal,
+            accelerated_move_delay_horizontal,
+            initial_move_delay_vertical,
+            accelerated_move_delay_vertical,
+            acceleration_threshold,
+            seed)
         self.clock = pygame.time.Clock()
-        self.grid = Grid(GRID_WIDTH, GRID_HEIGHT)
-        self.bag = self.generate_bag()
-        self.next_shapes = [self.get_next_shape() for _ in range(3)]
-        self.current_shape = self.get_next_shape()
-        self.current_x = GRID_WIDTH // 2 - \
-            len(self.current_shape.shape[0]) // 2
-        self.current_y = 0
-        self.held_shape = None
-        self.held_color = None
-        self.held_used = False
-        self.game_over = False
-        self.fall_time = 0
-        self.move_time_horizontal = 0
-        self.move_time_vertical = 0
-        self.initial_move_delay_horizontal = initial_move_delay_horizontal
-        self.accelerated_move_delay_horizontal = accelerated_move_delay_horizontal
-        self.initial_move_delay_vertical = initial_move_delay_vertical
-        self.accelerated_move_delay_vertical = accelerated_move_delay_vertical
-        self.acceleration_threshold = acceleration_threshold
         self.last_time = pygame.time.get_ticks()
-        self.score = 0
-        self.level = 1
-        self.lines_cleared = 0
-
-    def generate_bag(self):
-        shapes = list(SHAPES.keys())
-        random.shuffle(shapes)
-        return shapes
-
-    def get_next_shape(self):
-        if not self.bag:
-            self.bag = self.generate_bag()
-        shape_name = self.bag.pop(0)
-        shape = SHAPES[shape_name]
-        color = SHAPE_COLORS[shape_name]
-        return Shape(shape, color)
+        self.tick_ms = global_settings["tick_ms"]
+        self.accumulator = 0  # Реальное время, еще не отданное симуляции, мс
+        self.pending_inputs = 0  # Однократные действия до следующего шага
+        self.controller = controller  # Например, game.ai.AIController
+        self.fixed_seed = seed  # seed, заданный снаружи (общий seed сражения)
+        self.restartable = True  # Можно ли начать партию заново клавишей R
+        self.renderer = BoardRenderer()
+        # Боковая панель живет всю партию и перерисовывается по частям
+        self.info_surface = pygame.Surface((INFO_PANEL_WIDTH, SCREEN_HEIGHT))
+        self.info_state = None  # Что нарисовано на панели: (удержанная, следующие, очки, уровень)
+        self.info_text_rects = None  # Прямоугольники надписей очков и уровня
+        self.profiler = FrameProfiler(global_settings["profile_frames"])
+        if global_settings["record_replays"]:
+            self.recorder = ReplayRecorder(
+                self, global_settings["replay_keyframe_interval"])
+
+    def restart(self):
+        """Новая партия с текущими настройками.
+
+        seed, заданный снаружи, сохраняется: в сражении соперник
+        восстанавливает очередь фигур по общему seed.
+        """
+        self.__init__(
+            initial_move_delay_horizontal=global_settings["initial_move_delay_horizontal"],
+            accelerated_move_delay_horizontal=global_settings["accelerated_move_delay_horizontal"],
+            initial_move_delay_vertical=global_settings["initial_move_delay_vertical"],
+            accelerated_move_delay_vertical=global_settings["accelerated_move_delay_vertical"],
+            acceleration_threshold=global_settings["acceleration_threshold"],
+            controller=self.controller,
+            seed=self.fixed_seed)
+
+    def save_replay(self, prefix="game"):
+        """Сохранение записи партии, если она велась."""
+        if self.recorder is None:
+            return None
+        path = self.recorder.save(self, global_settings["replay_dir"], prefix)
+        self.recorder = None
+        return path
+
+    def save_profile(self, prefix="frames"):
+        """Сохранение замеров кадров в CSV, если они велись."""
+        return self.profiler.save(global_settings["profile_dir"], prefix)
 
     def handle_events(self):
         for event in pygame.event.get():
@@ -61,146 +87,64 @@ class TetrisGame:
                 return True
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_UP:
-                    rotated_shape = self.current_shape.rotate()
-                    if self.grid.valid_move(
-                            rotated_shape.shape,
-                            self.current_x,
-                            self.current_y):
-                        self.current_shape = rotated_shape
+                    self.pending_inputs |= INPUT_ROTATE
                 if event.key == pygame.K_SPACE:
-                    while self.grid.valid_move(
-                            self.current_shape.shape,
-                            self.current_x,
-                            self.current_y + 1):
-                        self.current_y += 1
-                    self.place_current_shape()
-                    self.clear_lines()
-                    self.spawn_new_shape()
-                    if not self.grid.valid_move(
-                            self.current_shape.shape,
-                            self.current_x,
-                            self.current_y):
-                        self.game_over = True
-                        break
+                    self.pending_inputs |= INPUT_HARD_DROP
                 if event.key == pygame.K_LSHIFT or event.key == pygame.K_RSHIFT:
-                    if not self.held_used:
-                        if self.held_shape is None:
-                            self.held_shape = self.current_shape
-                            self.held_color = self.current_shape.color
-                            self.spawn_new_shape()
-                        else:
-                            self.held_shape, self.current_shape = self.current_shape, self.held_shape
-                            self.held_color, self.current_shape.color = self.current_shape.color, self.held_color
-                        self.current_x = GRID_WIDTH // 2 - \
-                            len(self.current_shape.shape[0]) // 2
-                        self.current_y = 0
-                        self.held_used = True
-                if event.key == pygame.K_r:
-                    self.__init__()
+                    self.pending_inputs |= INPUT_HOLD
+                if event.key == pygame.K_F3:
+                    self.profiler.toggle_overlay()
+                if event.key == pygame.K_r and self.restartable:
+                    self.save_replay()
+                    self.save_profile()
+                    self.restart()
                     return None
                 if event.key == pygame.K_ESCAPE:
                     return "menu"
         return None
 
     def handle_key_presses(self):
-        keys = pygame.key.get_pressed()
-        horizontal_move_delay = self.initial_move_delay_horizontal
-        vertical_move_delay = self.initial_move_delay_vertical
+        """Считывание удерживаемых клавиш и шаги симуляции фиксированной длины.
+
+        Прошедшее реальное время копится в accumulator и отдается движку
+        шагами по tick_ms, поэтому скорость игры не зависит от частоты
+        кадров: медленный кадр просто дает больше шагов в следующем.
+        Однократные действия попадают в первый шаг; если в этом кадре шагов
+        нет, они ждут следующего.
+        """
         current_time = pygame.time.get_ticks()
-        time_passed = current_time - self.last_time
+        # Долгие паузы (перетаскивание окна и т. п.) не догоняются целиком
+        self.accumulator += min(current_time - self.last_time, MAX_FRAME_MS)
         self.last_time = current_time
+        tick_ms = self.tick_ms
+        if self.accumulator < tick_ms:
+            self.profiler.mark("input")
+            return
+        keys = pygame.key.get_pressed()
+        inputs = self.pending_inputs
         if keys[pygame.K_LEFT]:
-            if self.grid.valid_move(
-                    self.current_shape.shape,
-                    self.current_x - 1,
-                    self.current_y):
-                if self.move_time_horizontal == 0 or self.move_time_horizontal >= horizontal_move_delay:
-                    self.current_x -= 1
-                    self.move_time_horizontal = 0
-                if self.move_time_horizontal >= self.acceleration_threshold:
-                    horizontal_move_delay = self.accelerated_move_delay_horizontal
+            inputs |= INPUT_LEFT
         if keys[pygame.K_RIGHT]:
-            if self.grid.valid_move(
-                    self.current_shape.shape,
-                    self.current_x + 1,
-                    self.current_y):
-                if self.move_time_horizontal == 0 or self.move_time_horizontal >= horizontal_move_delay:
-                    self.current_x += 1
-                    self.move_time_horizontal = 0
-                if self.move_time_horizontal >= self.acceleration_threshold:
-                    horizontal_move_delay = self.accelerated_move_delay_horizontal
+            inputs |= INPUT_RIGHT
         if keys[pygame.K_DOWN]:
-            if self.grid.valid_move(
-                    self.current_shape.shape,
-                    self.current_x,
-                    self.current_y + 1):
-                if self.move_time_vertical == 0 or self.move_time_vertical >= vertical_move_delay:
-                    self.current_y += 1
-                    self.move_time_vertical = 0
-                if self.move_time_vertical >= self.acceleration_threshold:
-                    vertical_move_delay = self.accelerated_move_delay_vertical
-        self.move_time_horizontal += time_passed
-        self.move_time_vertical += time_passed
-        self.fall_time += time_passed
-
-    def place_current_shape(self):
-        self.grid.place_shape(
-            self.current_shape.shape,
-            self.current_x,
-            self.current_y)
-
-    def clear_lines(self):
-        lines_cleared = self.grid.clear_lines()
-        if lines_cleared > 0:
-            self.score += SCORE_TABLE.get(lines_cleared, 0)
-            self.lines_cleared += lines_cleared
-            # Увеличиваем уровень каждые 10 очищенных линий
-            if self.lines_cleared >= self.level * 10:
-                self.level += 1
-                self.initial_move_delay_vertical = max(
-                    50, self.initial_move_delay_vertical - 20)  # Увеличиваем скорость
-
-    def spawn_new_shape(self):
-        self.current_shape = self.next_shapes.pop(0)
-        self.next_shapes.append(self.get_next_shape())
-        self.current_x = GRID_WIDTH // 2 - \
-            len(self.current_shape.shape[0]) // 2
-        self.current_y = 0
-        self.held_used = False
-
-    def update_falling_shape(self):
-        if self.fall_time / \
-                1000 >= (1 / self.level):  # Регулируем скорость падения в зависимости от уровня
-            if self.grid.valid_move(
-                    self.current_shape.shape,
-                    self.current_x,
-                    self.current_y + 1):
-                self.current_y += 1
-            else:
-                self.place_current_shape()
-                self.clear_lines()
-                self.spawn_new_shape()
-            if not self.grid.valid_move(
-                    self.current_shape.shape,
-                    self.current_x,
-                    self.current_y):
-                self.game_over = True
-            self.fall_time = 0
+            inputs |= INPUT_DOWN
+        if self.controller is not None:
+            inputs |= self.controller.next_input(self)
+        self.pending_inputs = 0
+        self.profiler.mark("input")
+        while self.accumulator >= tick_ms:
+            self.step(inputs, tick_ms)
+            inputs &= HELD_INPUTS
+            self.accumulator -= tick_ms
 
     def draw_shadow(self, screen, x_offset=0):
-        shadow_y = self.current_y
-        while self.grid.valid_move(
-                self.current_shape.shape,
-                self.current_x,
-                shadow_y + 1):
-            shadow_y += 1
-        self.current_shape.draw(
+        draw_shape(
             screen,
-            self.current_x +
-            x_offset //
-            GRID_SIZE,
-            shadow_y,
-            alpha=128)
+            self.current_shape,
+            self.current_x,
+            self.landing_y(),
+            ghost=True,
+            x_offset=x_offset)
 
     def draw_held_info(self, screen):
         # Позиция для отрисовки удержанной фигуры
@@ -215,23 +159,16 @@ class TetrisGame:
              GRID_SIZE * 4),
             1)
         if self.held_shape is not None:
-
-            # Рисуем удержанную фигуру
-            for i, row in enumerate(self.held_shape.shape):
-                for j, cell in enumerate(row):
-                    if cell:
-                        # Рассчитываем позицию каждого блока фигуры
-                        block_x = offset_x + j * GRID_SIZE
-                        block_y = offset_y + i * GRID_SIZE
-                        pygame.draw.rect(
-                            screen, self.held_shape.color, (block_x, block_y, GRID_SIZE, GRID_SIZE))
-                        pygame.draw.rect(
-                            screen, GRAY, (block_x, block_y, GRID_SIZE, GRID_SIZE), 1)
+            # Рисуем удержанную фигуру клетками из атласа
+            get_atlas().draw_cells(
+                screen, self.held_shape.cells, self.held_shape.color,
+                TILE_BLOCK, offset_x, offset_y)
 
     def draw_next_shapes(self, screen):
         offset_x = (GRID_WIDTH * GRID_SIZE) // 2  # Отступ от игрового поля
         offset_y = 40  # Отступ сверху
         spacing = GRID_SIZE * 4  # Расстояние между фигурами
+        atlas = get_atlas()
 
         for idx, shape in enumerate(self.next_shapes):
             # Рассчитываем позицию для каждой фигуры
@@ -243,67 +180,146 @@ class TetrisGame:
                 screen, GRAY, (x, y, GRID_SIZE * 4, GRID_SIZE * 4), 1)
 
             # Рисуем фигуру
-            for i, row in enumerate(shape.shape):
-                for j, cell in enumerate(row):
-                    if cell:
-                        # Рассчитываем позицию каждого блока фигуры
-                        block_x = x + j * GRID_SIZE
-                        block_y = y + i * GRID_SIZE
-                        pygame.draw.rect(
-                            screen, shape.color, (block_x, block_y, GRID_SIZE, GRID_SIZE))
-                        pygame.draw.rect(
-                            screen, GRAY, (block_x, block_y, GRID_SIZE, GRID_SIZE), 1)
+            atlas.draw_cells(screen, shape.cells, shape.color, TILE_BLOCK, x, y)
 
     def draw_info_window(self, screen, x_offset=0):
-        info_surface = pygame.Surface(
-            (SCREEN_WIDTH - GRID_WIDTH * GRID_SIZE + x_offset, SCREEN_HEIGHT))
-        info_surface.fill(BLACK)
-        font = pygame.font.Font(None, 36)
-        held_text = font.render("Удержано", True, WHITE)
-        next_text = font.render("Следующие", True, WHITE)
-        score_text = font.render(f"Очки: {self.score}", True, WHITE)
-        level_text = font.render(f"Уровень: {self.level}", True, WHITE)
-        info_surface.blit(held_text, (10, 10))
-        info_surface.blit(next_text, (150, 10))
-        info_surface.blit(score_text, (10, 300))
-        info_surface.blit(level_text, (10, 350))
-        self.draw_held_info(info_surface)
-        self.draw_next_shapes(info_surface)
-        screen.blit(info_surface, (GRID_WIDTH * GRID_SIZE + x_offset, 0))
+        """Обновление боковой панели; возвращает измененные прямоугольники экрана."""
+        state = (self.held_shape, tuple(self.next_shapes), self.score, self.level)
+        if state == self.info_state:
+            return []
+        score_text = render_text(f"Очки: {self.score}", 36)
+        level_text = render_text(f"Уровень: {self.level}", 36)
+        text_rects = (score_text.get_rect(topleft=(10, 300)),
+                      level_text.get_rect(topleft=(10, 350)))
+
+        if self.info_state is None:
+            regions = [self.info_surface.get_rect()]
+        else:
+            held, next_shapes, score, level = self.info_state
+            regions = []
+            if held is not self.held_shape:
+                regions.append(pygame.Rect(10, 40, GRID_SIZE * 4, GRID_SIZE * 4))
+            spacing = GRID_SIZE * 4
+            for idx, shape in enumerate(self.next_shapes):
+                if idx >= len(next_shapes) or next_shapes[idx] is not shape:
+                    regions.append(pygame.Rect(
+                        (GRID_WIDTH * GRID_SIZE) // 2, 40 + idx * spacing,
+                        GRID_SIZE * 4, GRID_SIZE * 4))
+            if score != self.score:
+                regions.append(text_rects[0].union(self.info_text_rects[0]))
+            if level != self.level:
+                regions.append(text_rects[1].union(self.info_text_rects[1]))
+        self.info_state = state
+        self.info_text_rects = text_rects
+
+        # Каждая область очищается и дорисовывается всем, что в нее попадает
+        info_surface = self.info_surface
+        for region in regions:
+            info_surface.set_clip(region)
+            info_surface.fill(BLACK)
+            info_surface.blit(render_text("Удержано", 36), (10, 10))
+            info_surface.blit(render_text("Следующие", 36), (150, 10))
+            info_surface.blit(score_text, text_rects[0])
+            info_surface.blit(level_text, text_rects[1])
+            self.draw_held_info(info_surface)
+            self.draw_next_shapes(info_surface)
+        info_surface.set_clip(None)
+
+        left = GRID_WIDTH * GRID_SIZE + x_offset
+        return [screen.blit(info_surface, region.move(left, 0), region)
+                for region in regions]
+
+    def draw_frame(self, screen):
+        """Отрисовка поля, фигуры, тени и панели; возвращает dirty-прямоугольники."""
+        profiler = self.profiler
+        rects = self.renderer.render(
+            screen, self.grid.rows, self.current_shape,
+            self.current_x, self.current_y, self.landing_y())
+        profiler.mark("board")
+        rects += self.draw_info_window(screen)
+        profiler.mark("info")
+        return rects
+
+    def invalidate(self):
+        """Следующий кадр поля и панели будет нарисован целиком."""
+        self.renderer.invalidate()
+        self.info_state = None
+
+    def begin_frames(self, screen):
+        """Очистка экрана перед серией кадров с частичным обновлением."""
+        screen.fill(BLACK)
+        self.invalidate()
+        pygame.display.flip()
 
     def main_loop(self, screen):
+        self.begin_frames(screen)
+        profiler = self.profiler
         while not self.game_over:
-            screen.fill(BLACK)
+            profiler.start_frame()
             result = self.handle_events()
+            profiler.mark("events")
             if result is not None:
+                self.save_replay()
+                self.save_profile()
                 return result
             self.handle_key_presses()
-            self.update_falling_shape()
-            self.grid.draw(screen)
-            self.draw_shadow(screen)
-            self.current_shape.draw(screen, self.current_x, self.current_y)
-            self.draw_info_window(screen)
-            pygame.display.flip()
-            self.clock.tick(60)
+            profiler.mark("update")
+            rects = self.draw_frame(screen)
+            rects += profiler.draw_overlay(screen)
+            profiler.mark("overlay")
+            pygame.display.update(rects)
+            profiler.mark("display")
+            self.clock.tick(global_settings["max_fps"])
+            profiler.mark("wait")
+            profiler.end_frame()
+        self.save_replay()
+        self.save_profile()
 
         # После проигрыша показываем экран Game Over
         result = self.show_game_over_screen(screen)
         return result  # Возвращаем результат в run_game
 
+    def play_replay(self, screen, replay, speed=1.0):
+        """Воспроизведение записи в реальном времени с отрисовкой.
+
+        Игра должна быть создана из записи: replay.create_engine(TetrisGame).
+        """
+        self.recorder = None
+        self.begin_frames(screen)
+        steps = replay.steps()
+        sim_time = 0
+        start = pygame.time.get_ticks()
+        finished = False
+        while not finished:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    return True
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                    return "menu"
+            elapsed = (pygame.time.get_ticks() - start) * speed
+            while sim_time <= elapsed:
+                step = next(steps, None)
+                if step is None:
+                    finished = True
+                    break
+                inputs, dt_ms = step
+                self.step(inputs, dt_ms)
+                sim_time += dt_ms
+            pygame.display.update(self.draw_frame(screen))
+            self.clock.tick(global_settings["max_fps"])
+        return None
+
     def show_game_over_screen(self, screen):
-        while True:
+        def draw(screen):
             screen.fill(BLACK)
-            game_over_surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-            game_over_surface.fill(BLACK)
-            font = pygame.font.Font(None, 72)
-            game_over_text = font.render("Игра окончена", True, WHITE)
-            restart_text = font.render(
-                "Нажмите R для перезапуска", True, WHITE)
-            menu_text = font.render(
-                "Нажмите ESC для выхода в меню", True, WHITE)
-            score_text = font.render(
-                f"Финальный счет: {self.score}", True, WHITE)
-            game_over_surface.blit(
+            game_over_text = render_text("Игра окончена", 72)
+            restart_text = render_text(
+                "Нажмите R для перезапуска" if self.restartable else "", 72)
+            menu_text = render_text(
+                "Нажмите ESC для выхода в меню", 72)
+            score_text = render_text(
+                f"Финальный счет: {self.score}", 72)
+            screen.blit(
                 game_over_text,
                 (SCREEN_WIDTH //
                  2 -
@@ -314,7 +330,7 @@ class TetrisGame:
                  game_over_text.get_height() //
                  2 -
                  100))
-            game_over_surface.blit(
+            screen.blit(
                 score_text,
                 (SCREEN_WIDTH //
                  2 -
@@ -325,7 +341,7 @@ class TetrisGame:
                  score_text.get_height() //
                  2 -
                  50))
-            game_over_surface.blit(
+            screen.blit(
                 restart_text,
                 (SCREEN_WIDTH //
                  2 -
@@ -336,7 +352,7 @@ class TetrisGame:
                  restart_text.get_height() //
                  2 +
                  50))
-            game_over_surface.blit(
+            screen.blit(
                 menu_text,
                 (SCREEN_WIDTH //
                  2 -
@@ -347,21 +363,17 @@ class TetrisGame:
                  menu_text.get_height() //
                  2 +
                  100))
-            screen.blit(game_over_surface, (0, 0))
-            pygame.display.flip()
 
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    return True  # Выход из игры
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_r:
-                        # Перезапуск игры
-                        self.__init__(
-                            initial_move_delay_horizontal=global_settings["initial_move_delay_horizontal"],
-                            accelerated_move_delay_horizontal=global_settings["accelerated_move_delay_horizontal"],
-                            initial_move_delay_vertical=global_settings["initial_move_delay_vertical"],
-                            accelerated_move_delay_vertical=global_settings["accelerated_move_delay_vertical"],
-                            acceleration_threshold=global_settings["acceleration_threshold"])
-                        return "restart"  # Возвращаем "restart" для перезапуска
-                    if event.key == pygame.K_ESCAPE:
-                        return "menu"  # Возврат в главное меню
+        def handle_event(event):
+            if event.type == pygame.QUIT:
+                return True  # Выход из игры
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_r and self.restartable:
+                    # Перезапуск игры
+                    self.restart()
+                    return "restart"  # Возвращаем "restart" для перезапуска
+                if event.key == pygame.K_ESCAPE:
+                    return "menu"  # Возврат в главное меню
+            return CONTINUE
+
+        return run_ui_loop(screen, draw, handle_event)
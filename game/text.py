@@ -0,0 +1,24 @@
+# text.py
+
+from functools import lru_cache
+
+import pygame
+
+from .constants import WHITE
+
+TEXT_CACHE_SIZE = 256  # Сколько отрисованных надписей хранить
+
+
+@lru_cache(maxsize=None)
+def get_font(size):
+    """Шрифт по умолчанию нужного размера; загружается один раз."""
+    return pygame.font.Font(None, size)
+
+
+@lru_cache(maxsize=TEXT_CACHE_SIZE)
+def render_text(text, size, color=WHITE):
+    """Отрисованная надпись из кэша (text, size, color).
+
+    Поверхность общая для всех вызовов, изменять ее нельзя.
+    """
+    return get_font(size).render(text, True, color)
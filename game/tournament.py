@@ -0,0 +1,155 @@
+# tournament.py
+
+import csv
+import json
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .ai import AIController, TetrisAI
+from .engine import TetrisEngine
+
+RESULT_FIELDS = ["game", "mode", "seed", "player", "result", "score",
+                 "lines", "pieces", "level", "duration_ms", "wall_ms"]
+
+
+def make_controller(weights=None, lookahead=False):
+    # Без ограничения времени решение ИИ зависит только от состояния,
+    # поэтому партия с тем же seed воспроизводится точно
+    return AIController(TetrisAI(weights=weights, lookahead=lookahead,
+                                 time_budget_ms=float("inf")))
+
+
+def player_result(engine, steps, dt_ms):
+    return {
+        "score": engine.score,
+        "lines": engine.lines_cleared,
+        "pieces": engine.pieces_placed,
+        "level": engine.level,
+        "duration_ms": steps * dt_ms,
+    }
+
+
+def play_survival(game, seed, max_pieces, dt_ms, weights=None, lookahead=False):
+    """Одиночная игра ИИ до проигрыша или max_pieces фигур."""
+    start = time.perf_counter()
+    engine = TetrisEngine(seed=seed)
+    controller = make_controller(weights, lookahead)
+    steps = 0
+    while not engine.game_over and engine.pieces_placed < max_pieces:
+        engine.step(controller.next_input(engine), dt_ms)
+        steps += 1
+    row = {"game": game, "mode": "survival", "seed": seed, "player": 0,
+           "result": "loss" if engine.game_over else "survived"}
+    row.update(player_result(engine, steps, dt_ms))
+    row["wall_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    return [row]
+
+
+def play_battle(game, seed, max_pieces, dt_ms, weights=(None, None),
+                lookahead=False):
+    """Сражение двух ИИ на одинаковой последовательности фигур.
+
+    Побеждает тот, кто продержался дольше; если оба дожили до max_pieces,
+    сравниваются очки.
+    """
+    start = time.perf_counter()
+    engines = [TetrisEngine(seed=seed), TetrisEngine(seed=seed)]
+    controllers = [make_controller(w, lookahead) for w in weights]
+    steps = 0
+    while not any(engine.game_over for engine in engines) and \
+            min(engine.pieces_placed for engine in engines) < max_pieces:
+        for engine, controller in zip(engines, controllers):
+            engine.step(controller.next_input(engine), dt_ms)
+        steps += 1
+    over = [engine.game_over for engine in engines]
+    if over[0] != over[1]:
+        winner = over.index(False)
+    elif engines[0].score != engines[1].score:
+        winner = 0 if engines[0].score > engines[1].score else 1
+    else:
+        winner = None
+    wall_ms = round((time.perf_counter() - start) * 1000, 3)
+    rows = []
+    for player, engine in enumerate(engines):
+        row = {"game": game, "mode": "battle", "seed": seed, "player": player,
+               "result": "draw" if winner is None else
+               ("win" if winner == player else "loss")}
+        row.update(player_result(engine, steps, dt_ms))
+        row["wall_ms"] = wall_ms
+        rows.append(row)
+    return rows
+
+
+def play_game(task):
+    mode, game, seed, max_pieces, dt_ms, weights, lookahead = task
+    if mode == "battle":
+        return play_battle(game, seed, max_pieces, dt_ms, weights, lookahead)
+    return play_survival(game, seed, max_pieces, dt_ms, weights[0], lookahead)
+
+
+class ResultWriter:
+    """Построчная запись результатов в CSV или JSONL (по расширению файла)."""
+
+    def __init__(self, path):
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.jsonl = path.endswith(".jsonl")
+        if not self.jsonl:
+            self.writer = csv.DictWriter(self.file, fieldnames=RESULT_FIELDS)
+            self.writer.writeheader()
+
+    def write(self, row):
+        if self.jsonl:
+            self.file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        else:
+            self.writer.writerow(row)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def summarize(rows, elapsed):
+    games = len({row["game"] for row in rows})
+    lines = [f"Сыграно партий: {games} за {elapsed:.2f} с "
+             f"({games / elapsed:.1f} партий/с)"]
+    for field in ("score", "lines", "pieces", "level"):
+        values = [row[field] for row in rows]
+        lines.append(f"  {field:<7} среднее {statistics.mean(values):10.1f}  "
+                     f"медиана {statistics.median(values):8.1f}  "
+                     f"макс {max(values):8}")
+    battle = [row for row in rows if row["mode"] == "battle"]
+    for player in (0, 1):
+        results = [row["result"] for row in battle if row["player"] == player]
+        if results:
+            lines.append(f"  игрок {player}: побед {results.count('win')}, "
+                         f"поражений {results.count('loss')}, "
+                         f"ничьих {results.count('draw')}")
+    return "\n".join(lines)
+
+
+def run_tournament(games, mode="survival", seed=0, max_pieces=1000,
+                   dt_ms=16, weights=(None, None), lookahead=False,
+                   workers=None, output=None):
+    """Параллельный прогон партий; seed партии i равен seed + i."""
+    tasks = [(mode, game, seed + game, max_pieces, dt_ms, weights, lookahead)
+             for game in range(games)]
+    workers = workers or os.cpu_count()
+    writer = ResultWriter(output) if output else None
+    rows = []
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunksize = max(1, games // (workers * 8))
+            for game_rows in executor.map(play_game, tasks, chunksize=chunksize):
+                for row in game_rows:
+                    rows.append(row)
+                    if writer is not None:
+                        writer.write(row)
+    finally:
+        if writer is not None:
+            writer.close()
+    elapsed = time.perf_counter() - start
+    print(summarize(rows, elapsed))
+    return rows
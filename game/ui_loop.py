@@ -0,0 +1,40 @@
+# ui_loop.py
+
+import pygame
+
+IDLE_TIMEOUT_MS = 100  # Как часто проверять состояние без событий
+
+CONTINUE = object()  # Обработчик возвращает его, чтобы экран оставался открытым
+REDRAW = object()  # poll возвращает его, когда экран нужно перерисовать
+
+
+def run_ui_loop(screen, draw, handle_event, poll=None, timeout_ms=IDLE_TIMEOUT_MS):
+    """Цикл экрана меню, который спит до прихода события.
+
+    draw(screen) рисует экран целиком; вызывается сначала и после каждой
+    пачки событий. handle_event(event) и poll() возвращают CONTINUE или
+    результат экрана, который и возвращает цикл. poll вызывается не реже
+    раза в timeout_ms и при изменении состояния (например, подключился
+    второй игрок) может вернуть результат или REDRAW.
+    """
+    redraw = True
+    while True:
+        if redraw:
+            draw(screen)
+            pygame.display.flip()
+            redraw = False
+
+        event = pygame.event.wait(timeout_ms)
+        events = [] if event.type == pygame.NOEVENT else [event] + pygame.event.get()
+        for event in events:
+            result = handle_event(event)
+            if result is not CONTINUE:
+                return result
+            redraw = True
+
+        if poll is not None:
+            result = poll()
+            if result is REDRAW:
+                redraw = True
+            elif result is not CONTINUE:
+                return result
@@ -0,0 +1,22 @@
+# varint.py
+
+
+def encode_varint(value, out):
+    """Запись неотрицательного целого в out (bytearray) в формате LEB128."""
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varint(data, offset):
+    """Чтение числа из data с позиции offset; возвращает (число, новая позиция)."""
+    result = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, offset
+        shift += 7
@@ -1,6 +1,7 @@
 # main.py
 import pygame
 
+from game.atlas import get_atlas
 from game.constants import *
 from game.tetris_game import TetrisGame
 from ui.menu import show_menu, show_battle_connection_menu, show_settings_menu
@@ -10,6 +11,7 @@ def run_game():
     pygame.init()
     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
     pygame.display.set_caption("Tetris")
+    get_atlas()  # Клетки фигур рисуются один раз при запуске
 
     while True:
         menu_result = show_menu(screen)
@@ -0,0 +1,101 @@
+# authority.py
+
+from game.engine import TetrisEngine, HELD_INPUTS, INPUT_SONIC_DROP
+from game.replay import SETTINGS_FIELDS
+
+from network.protocol import *
+
+HEARTBEAT_MS = 250  # Без нажатий клиент сообщает о ходе времени не реже этого
+MAX_LEAD_MS = 250  # Насколько шаги клиента могут опережать часы сервера
+VALID_INPUTS = (INPUT_SONIC_DROP << 1) - 1  # Все биты INPUT_*
+
+
+class InputSender:
+    """Клиент при сервере-арбитре: входы шагов TetrisEngine уходят на сервер.
+
+    Подключается как engine.input_listener. MSG_INPUT отправляется, когда
+    входы шага отличаются от удерживаемых клавиш прошлого шага, и не реже
+    HEARTBEAT_MS, чтобы сервер продвигал гравитацию и без нажатий.
+    """
+
+    def __init__(self, send, tick_ms):
+        self.send = send  # Например, BattleClient.send_message
+        self.heartbeat_ticks = max(1, HEARTBEAT_MS // tick_ms)
+        self.tick = 0  # Номер следующего шага
+        self.held = 0  # Удерживаемые клавиши прошлого шага
+        self.last_sent = 0
+        self.sent = 0
+        self.bytes_sent = 0
+
+    def __call__(self, inputs, dt_ms):
+        if inputs != self.held or self.tick - self.last_sent >= self.heartbeat_ticks:
+            self.send_input(self.tick, inputs)
+        self.held = inputs & HELD_INPUTS
+        self.tick += 1
+
+    def flush(self):
+        """Сообщение о текущем шаге, например в конце партии."""
+        self.send_input(self.tick, self.held)
+
+    def send_input(self, tick, inputs):
+        message = encode_input(tick, inputs)
+        self.send(message)
+        self.last_sent = tick
+        self.sent += 1
+        self.bytes_sent += len(message)
+
+
+class PlayerSimulation:
+    """Серверная партия игрока, которую продвигают только его MSG_INPUT.
+
+    Шаги до номера из сообщения выполняются с прежними входами через
+    TetrisEngine.advance, поэтому время без нажатий почти ничего не стоит.
+    """
+
+    def __init__(self, seed, rules):
+        self.tick_ms = rules["tick_ms"]
+        self.engine = TetrisEngine(
+            seed=seed, **{field: rules[field] for field in SETTINGS_FIELDS})
+        self.tick = 0  # Шаги до этого номера уже выполнены
+        self.pending = 0  # Входы шага self.tick
+        self.encoder = StateEncoder(auto_ack=True)  # Поле этого игрока к сопернику
+        self.key = None
+
+    def apply(self, tick, inputs, max_tick):
+        """Шаги до tick с прежними входами, с шага tick - inputs.
+
+        Номер шага не может уменьшаться или опережать часы сервера
+        (max_tick), а входы - содержать неизвестные биты.
+        """
+        if tick < self.tick or tick > max_tick or inputs & ~VALID_INPUTS:
+            raise ProtocolError(
+                f"Недопустимые входы: шаг {tick} (выполнено {self.tick}, "
+                f"допустимо до {max_tick:.0f}), входы {inputs:#x}")
+        if tick > self.tick:
+            self.engine.advance(self.pending, tick - self.tick, self.tick_ms)
+            self.pending = inputs
+            self.tick = tick
+        else:
+            # Еще одно сообщение того же шага: однократные действия складываются
+            self.pending = (self.pending & ~HELD_INPUTS) | inputs
+
+    def changed(self):
+        """Изменилось ли то, что видит соперник, с прошлого вызова."""
+        engine = self.engine
+        key = (engine.grid.version, engine.held_shape, engine.bag.position,
+               engine.score, engine.level, engine.game_over)
+        if key == self.key:
+            return False
+        self.key = key
+        return True
+
+    def state(self):
+        engine = self.engine
+        return {
+            "rows": list(engine.grid.rows),
+            "score": engine.score,
+            "level": engine.level,
+            "held_shape": engine.held_shape,
+            "bag_position": engine.bag.position,
+            "game_over": engine.game_over,
+        }
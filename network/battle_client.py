@@ -1,30 +1,75 @@
 # battle_client.py
 
+import selectors
 import socket
 import threading
+import time
+from collections import deque
 
 import pygame
-import pickle
 
 from game.settings import *
 from game.constants import *
+from game.bag import PieceBag
 from game.grid import Grid
+from game.renderer import BoardRenderer
 from game.tetris_game import TetrisGame
+from game.text import render_text
+from game.ui_loop import CONTINUE, run_ui_loop
 
 from ui.error_handler import show_error_message
 
+from network.authority import InputSender
+from network.protocol import *
+from network.publisher import StatePublisher
+
+SEND_BUFFER = 8192  # Буфер отправки сокета, байты
+IO_POLL_SECONDS = 1  # Как часто поток ввода-вывода проверяет таймаут
+RECEIVE_TIMEOUT = 30  # Без данных от сервера дольше этого соединение считается потерянным
+# (сервер присылает хотя бы MSG_KEEPALIVE, см. battle_server.KEEPALIVE_INTERVAL)
+
 # Класс клиентского подключения
 class BattleClient:
+    """Подключение к серверу сражений.
+
+    Сетью занимается отдельный поток с неблокирующим сокетом и selectors,
+    игровой цикл с ним не ждет друг друга:
+      - send_data кладет состояние в ячейку outgoing_state; если прошлое
+        еще не ушло, оно заменяется, и отправляется только новейшее;
+      - send_message ставит служебное сообщение или входы в очередь
+        outgoing, они уходят все и по порядку;
+      - состояние соперника публикуется одной ссылкой received =
+        (версия, состояние), поэтому версия и данные всегда согласованы.
+    """
+
     def __init__(self, server_ip, server_port):
         self.server_ip = server_ip
         self.server_port = server_port
-        self.data = None
+        self.received = (0, None)  # (версия, состояние соперника); версия растет с каждым новым
+        self.outgoing_state = (0, None)  # (номер, новейшее состояние для отправки)
+        self.outgoing = deque()  # Готовые сообщения, уходят все по порядку
+        self.encoder = StateEncoder()  # Наше состояние дельтами от подтвержденной базы
+        self.decoder = StateDecoder()  # Состояния соперника от сервера
         self.client_socket = None
+        self.wakeup_socket = None  # Запись сюда будит поток ввода-вывода
         self.connected = False
-        self.receive_thread = None
+        self.io_thread = None
         self.connection_error = None  # Флаг для ошибки подключения
         self.waiting_for_second_player = False  # Flag for second player waiting
         self.game_started = False  # Flag for GAME_STARTED event on the server
+        self.seed = None  # Общий seed последовательности фигур от сервера
+        self.rules = None  # Правила партии, если игру ведет сервер (см. encode_start)
+        self.opponent_left = False  # Сервер закрыл подключение, потому что соперник ушел
+        self.states_sent = 0  # Состояний, ушедших на сервер
+        self.states_coalesced = 0  # Состояний, замененных более новыми до отправки
+
+    @property
+    def data(self):
+        return self.received[1]
+
+    @property
+    def data_version(self):
+        return self.received[0]
 
     def connect(self):
         """Подключение к серверу."""
@@ -32,12 +77,22 @@ class BattleClient:
             self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.client_socket.settimeout(30)  # Увеличиваем таймаут до 30 секунд
             self.client_socket.connect((self.server_ip, self.server_port))
+            # Мелкие сообщения уходят сразу, без алгоритма Нейгла
+            self.client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            # Маленький буфер отправки: на медленной связи устаревшие состояния
+            # не копятся в ядре, а заменяются новыми
+            self.client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER)
+            self.client_socket.setblocking(False)
+            wakeup_reader, self.wakeup_socket = socket.socketpair()
+            wakeup_reader.setblocking(False)
+            self.wakeup_socket.setblocking(False)
             self.connected = True
             print(f"Подключено к серверу {self.server_ip}:{self.server_port}")
 
-            # Запускаем поток для получения данных от сервера
-            self.receive_thread = threading.Thread(target=self.receive_data)
-            self.receive_thread.start()
+            # Запускаем поток для обмена данными с сервером
+            self.io_thread = threading.Thread(
+                target=self.run_io, args=(wakeup_reader,), daemon=True)
+            self.io_thread.start()
         except socket.gaierror as e:
             self.connection_error = f"Ошибка подключения: Неверный IP-адрес или порт. ({e})"
         except socket.timeout:
@@ -47,70 +102,130 @@ class BattleClient:
         except Exception as e:
             self.connection_error = f"Ошибка подключения: {e}"
         finally:
-            if not self.connected:
-                self.disconnect()
-
-    def receive_data(self):
-        """Получение данных от сервера."""
-        while self.connected:
-            try:
-                length_prefix = self.client_socket.recv(10)
-                if not length_prefix:
-                    print("Сервер отключился.")
-                    self.disconnect()
+            if not self.connected and self.client_socket is not None:
+                self.client_socket.close()
+
+    def run_io(self, wakeup_reader):
+        """Поток ввода-вывода: чтение и запись без блокировки через selectors."""
+        sock = self.client_socket
+        selector = selectors.DefaultSelector()
+        selector.register(sock, selectors.EVENT_READ)
+        selector.register(wakeup_reader, selectors.EVENT_READ)
+        stream = MessageStream()
+        pending = bytearray()  # Байты, которые сокет еще не принял
+        sent_version = 0
+        registered = selectors.EVENT_READ
+        last_received = time.monotonic()
+        try:
+            while self.connected:
+                if not pending:
+                    sent_version = self.take_outgoing(pending, sent_version)
+                events = selectors.EVENT_READ
+                if pending:
+                    events |= selectors.EVENT_WRITE
+                if events != registered:
+                    selector.modify(sock, events)
+                    registered = events
+                ready = selector.select(IO_POLL_SECONDS)
+                if time.monotonic() - last_received > RECEIVE_TIMEOUT:
+                    print("Таймаут получения данных. Проверьте соединение.")
                     break
+                for key, mask in ready:
+                    if key.fileobj is wakeup_reader:
+                        try:
+                            wakeup_reader.recv(4096)
+                        except BlockingIOError:
+                            pass
+                        continue
+                    if mask & selectors.EVENT_READ:
+                        try:
+                            data = sock.recv(65536)
+                        except BlockingIOError:
+                            data = None
+                        if data == b"":
+                            print("Сервер отключился.")
+                            return
+                        if data:
+                            last_received = time.monotonic()
+                            for msg_type, payload, _ in stream.feed(data):
+                                self.handle_message(msg_type, payload)
+                    if mask & selectors.EVENT_WRITE and pending:
+                        try:
+                            del pending[:sock.send(pending)]
+                        except BlockingIOError:
+                            pass
+        except Exception as e:
+            print(f"Ошибка соединения: {e}")
+        finally:
+            self.connected = False
+            selector.close()
+            wakeup_reader.close()
+            self.wakeup_socket.close()
+            sock.close()
+            print("Отключено от сервера.")
 
-                data_length = int(length_prefix.decode('utf-8'))
-
-                received_data = b""
-                while len(received_data) < data_length:
-                    chunk = self.client_socket.recv(data_length - len(received_data))
-                    if not chunk:
-                        break
-                    received_data += chunk
-
-                if len(received_data) != data_length:
-                    raise ValueError("Incomplete data received")
-
-                data = pickle.loads(received_data)
-
-                # Обрабатываем сообщение о том, что ожидается второй игрок
-                if data == "Ожидаем второго игрока...":
-                    self.waiting_for_second_player = True
-                elif data == 'Игра началась!':
-                    self.game_started = True
-                    self.waiting_for_second_player = False
-                elif type(data) == type(dict()):
-                    self.data = data
-
-            except socket.timeout:
-                print("Таймаут получения данных. Проверьте соединение.")
-                self.disconnect()
-                break
-            except Exception as e:
-                print(f"Ошибка получения данных: {e}")
-                self.disconnect()
-                break
+    def take_outgoing(self, pending, sent_version):
+        """Очередь сообщений и новейшее состояние - в буфер отправки."""
+        while self.outgoing:
+            pending += self.outgoing.popleft()
+        version, state = self.outgoing_state
+        if version != sent_version:
+            # Промежуточные состояния, не успевшие уйти, уже не нужны
+            self.states_coalesced += version - sent_version - 1
+            self.states_sent += 1
+            pending += self.encoder.encode(state)
+        return version
+
+    def handle_message(self, msg_type, payload):
+        """Сообщение от сервера (вызывается в потоке ввода-вывода)."""
+        # Обрабатываем сообщение о том, что ожидается второй игрок
+        if msg_type == MSG_WAITING:
+            self.waiting_for_second_player = True
+        elif msg_type == MSG_START:
+            self.seed, self.rules = decode_start(payload)
+            self.game_started = True
+            self.waiting_for_second_player = False
+        elif msg_type == MSG_STATE or msg_type == MSG_DELTA:
+            result = self.decoder.decode(msg_type, payload)
+            if result is None:
+                # База дельты неизвестна - просим ключевой кадр
+                self.outgoing.append(encode_message(MSG_RESYNC))
+            else:
+                self.received = (self.received[0] + 1, result[1])
+        elif msg_type == MSG_ACK:
+            self.encoder.ack(decode_ack(payload))
+        elif msg_type == MSG_RESYNC:
+            self.encoder.resync()
+        elif msg_type == MSG_OPPONENT_LEFT:
+            self.opponent_left = True
 
     def send_data(self, data):
-        """Отправка данных на сервер."""
+        """Отправка состояния игрока на сервер (дельтой или ключевым кадром).
+
+        Не блокирует: состояние уходит, когда сокет готов, а если к этому
+        времени появится более новое, отправится только оно.
+        """
         if self.connected:
-            try:
-                serialized_data = pickle.dumps(data)
-                data_length = len(serialized_data)
-                length_prefix = f"{data_length:010}".encode('utf-8')
-                self.client_socket.send(length_prefix + serialized_data)
+            self.outgoing_state = (self.outgoing_state[0] + 1, data)
+            self.wake()
 
-            except Exception as e:
-                print(f"Ошибка отправки данных: {e}")
-                self.disconnect()
+    def send_message(self, message):
+        """Отправка служебного сообщения протокола или входов (не блокирует)."""
+        if self.connected:
+            self.outgoing.append(message)
+            self.wake()
+
+    def wake(self):
+        try:
+            self.wakeup_socket.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass  # Поток и так проснется: в канале уже есть байты или он закрыт
 
     def disconnect(self):
-        """Отключение от сервера."""
+        """Отключение от сервера (сокет закрывает поток ввода-вывода)."""
         if self.connected:
-            self.client_socket.close()
             self.connected = False
-            print("Отключено от сервера.")
+            self.wake()
 
 # Класс игры сражения
 class BattleTetrisGame:
@@ -119,18 +234,43 @@ class BattleTetrisGame:
         self.server_port = server_port
         self.client = BattleClient(server_ip, server_port)
         self.client.connect()
-        self.game = TetrisGame(
-            initial_move_delay_horizontal=global_settings["initial_move_delay_horizontal"],
-            accelerated_move_delay_horizontal=global_settings["accelerated_move_delay_horizontal"],
-            initial_move_delay_vertical=global_settings["initial_move_delay_vertical"],
-            accelerated_move_delay_vertical=global_settings["accelerated_move_delay_vertical"],
-            acceleration_threshold=global_settings["acceleration_threshold"]
-        )
+        self.game = None
         # op - Opponent
         self.op_grid = Grid(GRID_WIDTH, GRID_HEIGHT)
         self.op_game = TetrisGame()
+        self.op_bag = None  # Последовательность фигур соперника (при общем seed)
         self.op_x_offset = 650
+        self.op_renderer = BoardRenderer(x_offset=self.op_x_offset)
+        self.op_version = None  # Версия состояния соперника на экране
 
+    def start_game(self, seed):
+        """Новая партия с общим seed, полученным от сервера."""
+        rules = self.client.rules
+        settings = global_settings if rules is None else rules
+        self.game = TetrisGame(
+            initial_move_delay_horizontal=settings["initial_move_delay_horizontal"],
+            accelerated_move_delay_horizontal=settings["accelerated_move_delay_horizontal"],
+            initial_move_delay_vertical=settings["initial_move_delay_vertical"],
+            accelerated_move_delay_vertical=settings["accelerated_move_delay_vertical"],
+            acceleration_threshold=settings["acceleration_threshold"],
+            seed=seed
+        )
+        self.op_bag = PieceBag(seed) if seed is not None else None
+        if rules is None:
+            self.input_sender = None
+            self.publisher = StatePublisher(
+                self.client.send_data, self.get_game_state,
+                global_settings["max_state_rate"])
+        else:
+            # Игру ведет сервер: ему уходят только входы шагов, а поле он
+            # считает сам по тем же правилам
+            self.game.tick_ms = rules["tick_ms"]
+            # Серверная партия идет от начала подключения и заново не
+            # начинается, поэтому и клиентскую перезапустить нельзя
+            self.game.restartable = False
+            self.publisher = None
+            self.input_sender = InputSender(self.client.send_message, rules["tick_ms"])
+            self.game.input_listener = self.input_sender
 
     def main_loop(self, screen):
         """Основной игровой цикл для режима сражения."""
@@ -151,85 +291,153 @@ class BattleTetrisGame:
 
             elif self.client.game_started:
                 result = self.game_loop(screen)
-                if result == "menu":
+                if not self.client.connected:
+                    break
+                if result != "restart":
+                    # Выход в меню или закрытие окна: соперник не ждет
+                    # ответа от брошенного подключения
+                    self.client.disconnect()
                     return "menu"
 
         # Если клиент отключился, возвращаемся в меню
-        show_error_message("Соединение с сервером потеряно.", screen)
+        if self.client.opponent_left:
+            show_error_message("Соперник покинул игру.", screen)
+        else:
+            show_error_message("Соединение с сервером потеряно.", screen)
         return "menu"
 
     def game_loop(self, screen):
         """Основной игровой цикл после начала игры."""
         clock = pygame.time.Clock()
+        self.start_game(self.client.seed)
+        self.game.begin_frames(screen)
+        self.op_renderer.invalidate()
+        self.op_game.invalidate()
+        self.op_version = None
 
         while not self.game.game_over:
-            screen.fill(BLACK)
+            profiler = self.game.profiler
+            profiler.start_frame()
             result = self.game.handle_events()
+            if not self.client.connected:
+                # Соперник ушел или связь потеряна: причину покажет main_loop
+                result = "menu"
             if result is not None:
+                self.game.save_replay("battle")
+                self.game.save_profile("battle_frames")
                 return result
 
             # UPDATING THE OP GAME STATE
+            # Состояние соперника применяется и рисуется только при новой версии
 
-            received_data = self.client.data
-            if received_data is not None:
-                self.update_game_state(received_data)
+            op_version, received_data = self.client.received
+            op_changed = op_version != self.op_version
+            if op_changed:
+                self.op_version = op_version
+                if received_data is not None:
+                    self.update_game_state(received_data)
+            profiler.mark("events")
 
             # CLIENT GAME
             self.game.handle_key_presses()
-            self.game.update_falling_shape()
-            self.game.grid.draw(screen)
-            self.game.draw_shadow(screen)
-            self.game.current_shape.draw(screen, self.game.current_x, self.game.current_y)
-            self.game.draw_info_window(screen)
+            profiler.mark("update")
+            rects = self.game.draw_frame(screen)
 
             # OP GAME
 
-            self.op_game.grid.draw(screen, x_offset=self.op_x_offset)
-            self.op_game.draw_info_window(screen, x_offset=self.op_x_offset)
+            if op_changed:
+                rects += self.op_renderer.render(screen, self.op_game.grid.rows)
+                rects += self.op_game.draw_info_window(screen, x_offset=self.op_x_offset)
+            profiler.mark("opponent")
+            rects += profiler.draw_overlay(screen)
+            profiler.mark("overlay")
 
             # SENDING THE GAME STATE
-            game_state = self.get_game_state()
-            self.client.send_data(game_state)
-
-            pygame.display.flip()
-            clock.tick(120)
+            # Только при изменениях и не чаще max_state_rate; при сервере-арбитре
+            # входы уже ушли из шагов симуляции
+            if self.publisher is not None:
+                self.publisher.update(self.state_key(), pygame.time.get_ticks())
+            profiler.mark("network")
+
+            pygame.display.update(rects)
+            profiler.mark("display")
+            clock.tick(global_settings["max_fps"])
+            profiler.mark("wait")
+            profiler.end_frame()
+        # Соперник должен увидеть финальное состояние сразу
+        if self.publisher is not None:
+            self.publisher.flush(pygame.time.get_ticks())
+            print("Состояния: отправлено {sent}, подавлено кадров {suppressed}, "
+                  "объединено изменений {coalesced}".format(**self.publisher.stats()))
+        else:
+            self.input_sender.flush()
+            print(f"Входы: отправлено {self.input_sender.sent} сообщений, "
+                  f"{self.input_sender.bytes_sent} байт")
+        self.game.save_replay("battle")
+        self.game.save_profile("battle_frames")
         # После проигрыша показываем экран Game Over
 
         result = self.game.show_game_over_screen(screen)
         return result  # Возвращаем результат в run_game
 
+    def state_key(self):
+        """Дешевый ключ состояния для соперника: меняется при фиксации фигуры,
+        очистке линий, удержании, смене очков, уровня и конце игры."""
+        game = self.game
+        return (game.grid, game.grid.version, game.held_shape, game.bag.position,
+                game.score, game.level, game.game_over)
+
     def get_game_state(self):
 
         game_state = {
-            "grid": self.game.grid.grid,
+            "rows": list(self.game.grid.rows),
             "score": self.game.score,
             "level": self.game.level,
-            "next_shapes": self.game.next_shapes,
-            "held_shape": self.game.held_shape
+            "held_shape": self.game.held_shape,
+            "game_over": self.game.game_over
         }
+        if self.op_bag is not None:
+            # При общем seed соперник сам восстановит очередь по позиции в мешке
+            game_state["bag_position"] = self.game.bag.position
+        else:
+            game_state["next_shapes"] = list(self.game.next_shapes)
 
         return game_state
 
     def update_game_state(self, received):
-        self.op_game.grid.grid = received["grid"]
+        self.op_game.grid.set_rows(received["rows"])
         self.op_game.score = received["score"]
         self.op_game.level = received["level"]
-        self.op_game.next_shapes = received["next_shapes"]
+        if "bag_position" in received and self.op_bag is not None:
+            # Позицию уже ограничил StateDecoder (check_bag_position)
+            position = received["bag_position"]
+            self.op_game.next_shapes = [
+                self.op_bag.at(position - i) for i in range(3, 0, -1)]
+        else:
+            self.op_game.next_shapes = received["next_shapes"]
         self.op_game.held_shape = received["held_shape"]
+        self.op_game.game_over = received["game_over"]
 
     def show_waiting_for_second_player(self, screen):
         """Отображение сообщения о том, что ожидается второй игрок."""
-        while self.client.waiting_for_second_player:
+        def draw(screen):
             screen.fill(BLACK)
-            font = pygame.font.Font(None, 36)
-            waiting_text = font.render("Ожидаем второго игрока...", True, WHITE)
+            waiting_text = render_text("Ожидаем второго игрока...", 36)
             screen.blit(waiting_text, (SCREEN_WIDTH // 2 - waiting_text.get_width() // 2, SCREEN_HEIGHT // 2))
-            pygame.display.flip()
-            result = self.handle_events()
-            if result == "menu":
+
+        def handle_event(event):
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
                 self.client.disconnect()
                 return "menu"
-        return None
+            return CONTINUE
+
+        def poll():
+            # Второй игрок подключился или соединение потеряно
+            if not self.client.waiting_for_second_player or not self.client.connected:
+                return None
+            return CONTINUE
+
+        return run_ui_loop(screen, draw, handle_event, poll)
 
     def ok_debug(self):
         print("OK_debug()")
@@ -1,134 +1,256 @@
-import socket
-import threading
-import time
-import pickle
+import asyncio
+import random
+from collections import deque
 
+from game.settings import global_settings
 
-class BattleServer:
-    def __init__(self, host="0.0.0.0", port=5555):
-        self.host = host
-        self.port = port
-        self.server_socket = None
-        self.clients = []  # Список подключенных клиентов
-        self.lock = threading.Lock()  # Блокировка для потокобезопасности
+from network.authority import MAX_LEAD_MS, PlayerSimulation
+from network.protocol import *
 
-    def start(self):
-        """Запуск сервера."""
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+WAITING_INTERVAL = 5  # Как часто напоминать ожидающим игрокам, секунды
+# Как часто слать MSG_KEEPALIVE игрокам в комнатах, секунды: без него
+# игрок, соперник которого проиграл или стоит, ничего не получает и
+# отключается по RECEIVE_TIMEOUT клиента
+KEEPALIVE_INTERVAL = 5
+START_DELAY = 1  # Пауза между созданием комнаты и началом игры, секунды
+BACKLOG = 1024  # Очередь входящих подключений
+MAX_WRITE_BUFFER = 256 * 1024  # Клиент, не принимающий данные, отключается
+MAX_FILE_LIMIT = 65536  # Выше лимит открытых файлов не поднимается
+
+
+def raise_file_limit():
+    """Лимит открытых файлов до максимума, но не выше MAX_FILE_LIMIT:
+    каждый игрок - отдельный сокет.
+
+    Жесткий лимит бывает бесконечным (macOS) или выше предела ядра; если
+    поднять не удалось, остается прежний.
+    """
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target = MAX_FILE_LIMIT if hard == resource.RLIM_INFINITY else min(hard, MAX_FILE_LIMIT)
+    if soft != resource.RLIM_INFINITY and soft < target:
         try:
-            self.server_socket = socket.socket(
-                socket.AF_INET, socket.SOCK_STREAM)
-            self.server_socket.bind((self.host, self.port))
-            self.server_socket.listen(2)  # Ожидаем подключения двух клиентов
-            print(
-                f"Сервер запущен на {self.host}:{self.port}. Ожидание подключений...")
-            while len(self.clients) < 2:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+            soft = target
+        except (ValueError, OSError) as e:
+            print(f"Не удалось поднять лимит открытых файлов до {target}: {e}")
+    print(f"Лимит открытых файлов: {soft}")
+
+
+class PlayerConnection(asyncio.Protocol):
+    """Подключение одного игрока: разбор сообщений и буфер отправки."""
+
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.stream = MessageStream()
+        self.tracker = SeqTracker()  # Проверка и номера состояний этого игрока
+        self.room = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.server.add_player(self)
+
+    def data_received(self, data):
+        try:
+            for message in self.stream.feed(data):
+                self.server.handle_message(self, *message)
+        except ProtocolError as e:
+            print(f"Ошибка при обработке клиента: {e}")
+            self.transport.abort()
+
+    def connection_lost(self, exc):
+        self.server.remove_player(self)
+
+    def send(self, message):
+        transport = self.transport
+        if transport.is_closing():
+            return
+        if transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+            print("Клиент не успевает принимать данные, отключаем.")
+            transport.abort()
+            return
+        transport.write(message)
 
-                client_socket, client_address = self.server_socket.accept()
-                print(f"Подключен клиент: {client_address}")
-                self.clients.append(client_socket)
 
-                # Отправляем подтверждение подключения
+class Room:
+    """Два игрока одного сражения с общим seed."""
 
-                self.broadcast(
-                    "Подключено к серверу. Ожидаем второго игрока...")
+    def __init__(self, first, second):
+        self.players = (first, second)
+        self.seed = random.randrange(2 ** 32)
+        self.started = False
+        self.start_time = None
+        self.simulations = None  # Игрок -> PlayerSimulation, если игру ведет сервер
+        first.room = second.room = self
 
-                # Если подключен только один клиент, отправляем ему сообщение о
-                # состоянии
-                if len(self.clients) == 1:
-                    threading.Thread(
-                        target=self.notify_waiting, args=(
-                            client_socket,)).start()
+    def opponent(self, player):
+        first, second = self.players
+        return second if player is first else first
 
-            print("Оба игрока подключены. Начинаем игру!")
-            # Отправляем сообщение обоим клиентам о начале игры
-            time.sleep(1)
 
-            self.broadcast("Игра началась!")
+class BattleServer:
+    """Сервер сражений: подключения без ограничения числа, очередь подбора
+    соперников и независимые комнаты по два игрока в одном потоке asyncio.
 
-            for client_socket in self.clients:
-                threading.Thread(
-                    target=self.handle_client, args=(
-                        client_socket,)).start()
+    С authoritative=True сервер сам ведет партии обоих игроков по их
+    входам (MSG_INPUT) и рассылает соперникам получившиеся поля; поля от
+    клиентов не принимаются.
+    """
 
+    def __init__(self, host="0.0.0.0", port=5555, authoritative=False):
+        self.host = host
+        self.port = port
+        self.rules = None  # Правила партий, если игру ведет сервер
+        if authoritative:
+            self.rules = {field: global_settings[field] for field in RULE_FIELDS}
+        self.server = None
+        self.loop = None
+        self.queue = deque()  # Игроки, ожидающие соперника
+        self.rooms = set()
+
+    def start(self):
+        """Запуск сервера (блокирует до остановки)."""
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            pass
         except Exception as e:
             print(f"Ошибка при запуске сервера: {e}")
         finally:
-            self.stop()
+            print("Сервер остановлен.")
 
-    def notify_waiting(self, client_socket):
-        """Уведомление клиента о том, что сервер ожидает второго игрока."""
+    async def serve(self):
+        raise_file_limit()
+        loop = self.loop = asyncio.get_running_loop()
+        self.server = await loop.create_server(
+            lambda: PlayerConnection(self), self.host, self.port, backlog=BACKLOG)
+        print(f"Сервер запущен на {self.host}:{self.port}. Ожидание подключений...")
+        tasks = [loop.create_task(self.notify_waiting()),
+                 loop.create_task(self.keep_alive())]
         try:
-            while len(self.clients) < 2:
-                # client_socket.send(pickle.dumps("Ожидаем второго игрока..."))
-                self.broadcast("Ожидаем второго игрока...")
-                threading.Event().wait(5)  # Отправляем сообщение каждые 5 секунд
-        except Exception as e:
-            print(f"Ошибка при уведомлении клиента: {e}")
+            async with self.server:
+                await self.server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
 
-    def handle_client(self, client_socket):
-        """Обработка данных от клиента."""
-        try:
-            while True:
-                length_prefix = client_socket.recv(10)
-                if not length_prefix:
-                    break
+    async def notify_waiting(self):
+        """Напоминание ожидающим игрокам, что сервер ищет им соперника."""
+        message = encode_message(MSG_WAITING)
+        while True:
+            await asyncio.sleep(WAITING_INTERVAL)
+            for player in self.queue:
+                player.send(message)
 
-                # Преобразуем строку длины в целое число
-                data_len = int(length_prefix.decode('utf-8'))
+    async def keep_alive(self):
+        """MSG_KEEPALIVE всем игрокам в комнатах раз в KEEPALIVE_INTERVAL."""
+        message = encode_message(MSG_KEEPALIVE)
+        while True:
+            await asyncio.sleep(KEEPALIVE_INTERVAL)
+            for room in self.rooms:
+                for player in room.players:
+                    player.send(message)
 
-                # Читаем данные до тех пор, пока не будет считано нужное
-                # количество байтов
-                received_data = b""
-                while len(received_data) < data_len:
-                    chunk = client_socket.recv(data_len - len(received_data))
-                    if not chunk:
-                        break
-                    received_data += chunk
+    def add_player(self, player):
+        print(f"Подключен клиент: {player.transport.get_extra_info('peername')}")
+        player.send(encode_message(MSG_CONNECTED))
+        self.queue.append(player)
+        self.matchmake()
 
-                if len(received_data) != data_len:
-                    raise ValueError("Incomplete data received")
+    def matchmake(self):
+        """Пары из очереди становятся комнатами, оставшийся игрок ждет."""
+        while len(self.queue) >= 2:
+            room = Room(self.queue.popleft(), self.queue.popleft())
+            self.rooms.add(room)
+            asyncio.get_running_loop().call_later(START_DELAY, self.start_room, room)
+        for player in self.queue:
+            player.send(encode_message(MSG_WAITING))
 
-                # Десериализуем данные
-                data = pickle.loads(received_data)
+    def start_room(self, room):
+        if room not in self.rooms:
+            return  # Кто-то отключился до начала игры
+        room.started = True
+        room.start_time = self.loop.time()
+        if self.rules is not None:
+            room.simulations = {
+                player: PlayerSimulation(room.seed, self.rules) for player in room.players}
+        message = encode_start(room.seed, self.rules)
+        for player in room.players:
+            player.send(message)
 
-                self.broadcast(data, client_socket)
+    def handle_message(self, player, msg_type, payload, message):
+        if self.rules is not None:
+            self.handle_authoritative(player, msg_type, payload)
+        elif msg_type == MSG_STATE or msg_type == MSG_DELTA:
+            # Неверное состояние - ProtocolError, отправитель отключается,
+            # а соперник его не получает
+            seq = player.tracker.accept(msg_type, payload)
+            if seq is None:
+                # Дельта от неизвестной базы - просим ключевой кадр
+                player.send(encode_message(MSG_RESYNC))
+                return
+            player.send(encode_ack(seq))
+            self.forward(message, player)
+        elif msg_type == MSG_RESYNC:
+            # Соперник потерял базу: ключевой кадр должен прислать отправитель
+            self.forward(message, player)
 
-        except Exception as e:
-            print(f"Ошибка при обработке клиента: {e}")
-        finally:
-            self.remove_client(client_socket)
-
-    def broadcast(self, message, sender_socket=None):
-        """Отправка сообщения всем клиентам, кроме отправителя."""
-        with self.lock:
-            for client in self.clients:
-                if client != sender_socket:
-                    try:
-                        # Данные в полном объеме
-                        serialized_data = pickle.dumps(message)
-                        # Создаем префиксы длины всех данных
-                        data_len = len(serialized_data)
-                        len_prefix = f"{data_len:010}".encode("utf-8")
-
-                        client.send(len_prefix + serialized_data)
-
-                    except Exception as e:
-                        print(f"Ошибка при отправке сообщения клиенту: {e}")
-                        self.remove_client(client)
-
-    def remove_client(self, client_socket):
-        """Удаление клиента из списка."""
-        with self.lock:
-            if client_socket in self.clients:
-                self.clients.remove(client_socket)
-                client_socket.close()
-                print("Клиент отключен.")
+    def handle_authoritative(self, player, msg_type, payload):
+        """Сервер-арбитр: от клиента принимаются только входы."""
+        room = player.room
+        if room is None or room.simulations is None:
+            return  # Соперник ушел или игра еще не началась
+        if msg_type == MSG_INPUT:
+            tick, inputs = decode_input(payload)
+            simulation = room.simulations[player]
+            elapsed_ms = (self.loop.time() - room.start_time) * 1000
+            simulation.apply(tick, inputs, (elapsed_ms + MAX_LEAD_MS) / simulation.tick_ms)
+            if simulation.changed():
+                room.opponent(player).send(simulation.encoder.encode(simulation.state()))
+        elif msg_type == MSG_RESYNC:
+            # Клиент потерял базу потока соперника
+            room.simulations[room.opponent(player)].encoder.resync()
+
+    def forward(self, message, sender):
+        """Пересылка сообщения сопернику по комнате без перекодирования."""
+        if sender.room is not None:
+            sender.room.opponent(sender).send(message)
+
+    def remove_player(self, player):
+        """Отключение игрока: он покидает очередь, его комната закрывается.
+
+        Если игра в комнате еще не началась, соперник снова ждет в очереди,
+        иначе получает MSG_OPPONENT_LEFT и тоже отключается.
+        """
+        if player in self.queue:
+            self.queue.remove(player)
+        room = player.room
+        if room is not None:
+            self.rooms.discard(room)
+            for member in room.players:
+                member.room = None
+            survivor = room.opponent(player)
+            if not room.started:
+                self.queue.appendleft(survivor)
+                self.matchmake()
+            else:
+                survivor.send(encode_message(MSG_OPPONENT_LEFT))
+                survivor.transport.close()  # Закроется после отправки буфера
+        print("Клиент отключен.")
 
     def stop(self):
-        """Остановка сервера."""
-        if self.server_socket:
-            self.server_socket.close()
-            print("Сервер остановлен.")
+        """Остановка сервера (можно вызывать из другого потока)."""
+        if self.server:
+            self.loop.call_soon_threadsafe(self.server.close)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,522 @@
+# protocol.py
+
+import struct
+
+from game.constants import GRID_WIDTH, GRID_HEIGHT
+from game.pieces import PIECE_LIST, piece_by_id
+from game.replay import SETTINGS_FIELDS
+from game.varint import encode_varint, decode_varint
+
+# Сообщение: заголовок HEADER (версия протокола, тип, длина данных) и данные.
+#   MSG_CONNECTED, MSG_WAITING, MSG_RESYNC, MSG_OPPONENT_LEFT,
+#   MSG_KEEPALIVE - без данных
+#   MSG_START - varint общего seed, байт флагов START_* и правила партии
+#               (при START_AUTHORITATIVE, см. encode_start)
+#   MSG_STATE - ключевой кадр: varint номера и полное состояние (encode_state)
+#   MSG_DELTA - varint номера, varint номера базы и изменения (encode_delta)
+#   MSG_ACK   - varint номера состояния, принятого сервером
+#   MSG_INPUT - varint номера шага и varint входов INPUT_* (encode_input)
+PROTOCOL_VERSION = 4
+HEADER = struct.Struct("<BBH")
+MAX_PAYLOAD = 0xFFFF
+
+MSG_CONNECTED = 1
+MSG_WAITING = 2
+MSG_START = 3
+MSG_STATE = 4
+MSG_DELTA = 5
+MSG_ACK = 6
+MSG_RESYNC = 7  # Получатель не знает базу дельты и просит ключевой кадр
+MSG_INPUT = 8  # Входы игрока для сервера-арбитра
+MSG_OPPONENT_LEFT = 9  # Соперник отключился во время игры, сервер закрывает подключение
+MSG_KEEPALIVE = 10  # Сервер жив, даже если соперник ничего не присылает
+
+# Флаги MSG_START
+START_AUTHORITATIVE = 1 << 0  # Игру ведет сервер, клиенты шлют только входы
+
+# Правила партии в MSG_START: шаг симуляции и задержки клавиш TetrisEngine
+RULE_FIELDS = ("tick_ms",) + SETTINGS_FIELDS
+
+# Флаги MSG_STATE
+STATE_HELD = 1 << 0  # Есть удержанная фигура
+STATE_BAG = 1 << 1  # Вместо очереди передана позиция в общем мешке
+STATE_GAME_OVER = 1 << 2  # Игрок проиграл
+
+# Поля, изменившиеся в MSG_DELTA
+DELTA_ROWS = 1 << 0  # Число строк и пары (номер строки, uint16)
+DELTA_HELD = 1 << 1  # id удержанной фигуры, NO_PIECE - нет
+DELTA_BAG = 1 << 2  # varint позиции в мешке
+DELTA_NEXT = 1 << 3  # Длина и id фигур очереди
+DELTA_SCORE = 1 << 4  # varint очков
+DELTA_LEVEL = 1 << 5  # varint уровня
+DELTA_GAME_OVER = 1 << 6  # Байт: проиграл ли игрок
+NO_PIECE = 0xFF
+
+# Границы значений состояния: его присылает соперник, доверять ему нельзя
+FULL_MASK = (1 << GRID_WIDTH) - 1  # Все клетки строки поля
+MIN_BAG_POSITION = 3  # Очередь - три фигуры перед позицией в мешке
+MAX_BAG_AHEAD = 256  # На сколько фигур позиция в мешке уходит вперед за одно состояние
+MAX_COUNTER = 2 ** 32  # Очки и уровень меньше этого
+
+KEYFRAME_INTERVAL = 120  # Ключевой кадр каждые N сообщений
+HISTORY_SIZE = 64  # Сколько последних состояний помнит получатель
+MAX_PENDING = 256  # Без подтверждений дольше этого отправитель шлет ключевой кадр
+
+_STATE_HEAD = struct.Struct("<BB")  # флаги, число строк поля
+_ROW = struct.Struct("<BH")
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def encode_message(msg_type, payload=b""):
+    if len(payload) > MAX_PAYLOAD:
+        raise ProtocolError(f"Слишком длинное сообщение: {len(payload)} байт")
+    return HEADER.pack(PROTOCOL_VERSION, msg_type, len(payload)) + payload
+
+
+def encode_start(seed, rules=None):
+    """MSG_START: общий seed и, если игру ведет сервер, правила партии.
+
+    rules - словарь RULE_FIELDS; клиент обязан симулировать с ними, иначе
+    его поле разойдется с серверным.
+    """
+    payload = bytearray()
+    encode_varint(seed, payload)
+    payload.append(0 if rules is None else START_AUTHORITATIVE)
+    if rules is not None:
+        for field in RULE_FIELDS:
+            encode_varint(rules[field], payload)
+    return encode_message(MSG_START, bytes(payload))
+
+
+def decode_start(payload):
+    """(seed, правила) из MSG_START; правила None, если сервер только пересылает."""
+    try:
+        seed, offset = decode_varint(payload, 0)
+        flags = payload[offset]
+        offset += 1
+        rules = None
+        if flags & START_AUTHORITATIVE:
+            rules = {}
+            for field in RULE_FIELDS:
+                rules[field], offset = decode_varint(payload, offset)
+    except IndexError:
+        raise ProtocolError("Поврежденное сообщение начала игры") from None
+    return seed, rules
+
+
+def encode_input(tick, inputs):
+    """MSG_INPUT: с шага tick действуют входы inputs.
+
+    Однократные действия выполняются в шаге tick, удерживаемые клавиши -
+    до следующего MSG_INPUT. Сообщение без изменений только сообщает, что
+    клиент дошел до шага tick.
+    """
+    payload = bytearray()
+    encode_varint(tick, payload)
+    encode_varint(inputs, payload)
+    return encode_message(MSG_INPUT, bytes(payload))
+
+
+def decode_input(payload):
+    try:
+        tick, offset = decode_varint(payload, 0)
+        inputs, _ = decode_varint(payload, offset)
+    except IndexError:
+        raise ProtocolError("Поврежденное сообщение входов") from None
+    return tick, inputs
+
+
+def encode_state(state, seq):
+    """MSG_STATE: ключевой кадр с номером seq и полным состоянием игрока.
+
+    state - словарь: rows (битовые маски строк поля), score, level,
+    held_shape, game_over и bag_position (при общем seed) или next_shapes.
+    Строки идут как uint16, фигуры - по id, числа - varint.
+    """
+    rows = state["rows"]
+    held = state["held_shape"]
+    flags = 0
+    if held is not None:
+        flags |= STATE_HELD
+    if "bag_position" in state:
+        flags |= STATE_BAG
+    if state.get("game_over"):
+        flags |= STATE_GAME_OVER
+    payload = bytearray()
+    encode_varint(seq, payload)
+    payload += _STATE_HEAD.pack(flags, len(rows))
+    payload += struct.pack(f"<{len(rows)}H", *rows)
+    if held is not None:
+        payload.append(held.id)
+    if flags & STATE_BAG:
+        encode_varint(state["bag_position"], payload)
+    else:
+        payload.append(len(state["next_shapes"]))
+        payload.extend(shape.id for shape in state["next_shapes"])
+    encode_varint(state["score"], payload)
+    encode_varint(state["level"], payload)
+    return encode_message(MSG_STATE, bytes(payload))
+
+
+def _piece(piece_id):
+    if piece_id >= len(PIECE_LIST):
+        raise ProtocolError(f"Неизвестная фигура: {piece_id}")
+    return piece_by_id(piece_id)
+
+
+def _check_row(i, row):
+    if not 0 <= i < GRID_HEIGHT:
+        raise ProtocolError(f"Строка {i} вне поля")
+    if row & ~FULL_MASK:
+        raise ProtocolError(f"Строка {i} шире поля: {row:#x}")
+
+
+def _check_counter(name, value):
+    if value >= MAX_COUNTER:
+        raise ProtocolError(f"Недопустимое значение {name}: {value}")
+
+
+def decode_state(payload, offset=0):
+    """Полное состояние с позиции offset; словарь с теми же ключами, что у encode_state.
+
+    Поле должно быть GRID_HEIGHT строк по GRID_WIDTH клеток.
+    """
+    try:
+        flags, count = _STATE_HEAD.unpack_from(payload, offset)
+        offset += _STATE_HEAD.size
+        if count != GRID_HEIGHT:
+            raise ProtocolError(f"Поле из {count} строк вместо {GRID_HEIGHT}")
+        rows = list(struct.unpack_from(f"<{count}H", payload, offset))
+        if max(rows) > FULL_MASK:  # Строки беззнаковые: лишние биты дают большее число
+            raise ProtocolError(f"Строка поля шире {GRID_WIDTH} клеток")
+        state = {"rows": rows}
+        offset += 2 * count
+        state["game_over"] = bool(flags & STATE_GAME_OVER)
+        state["held_shape"] = None
+        if flags & STATE_HELD:
+            state["held_shape"] = _piece(payload[offset])
+            offset += 1
+        if flags & STATE_BAG:
+            state["bag_position"], offset = decode_varint(payload, offset)
+        else:
+            length = payload[offset]
+            state["next_shapes"] = [
+                _piece(piece_id) for piece_id in payload[offset + 1:offset + 1 + length]]
+            offset += 1 + length
+        state["score"], offset = decode_varint(payload, offset)
+        state["level"], offset = decode_varint(payload, offset)
+    except (IndexError, struct.error) as e:
+        raise ProtocolError(f"Поврежденное состояние: {e}") from None
+    _check_counter("очков", state["score"])
+    _check_counter("уровня", state["level"])
+    return state
+
+
+def decode_keyframe(payload):
+    """(номер, состояние) из данных MSG_STATE."""
+    try:
+        seq, offset = decode_varint(payload, 0)
+    except IndexError:
+        raise ProtocolError("Поврежденный ключевой кадр") from None
+    return seq, decode_state(payload, offset)
+
+
+def encode_delta(seq, base_seq, base, state):
+    """MSG_DELTA: отличия state от состояния base с номером base_seq."""
+    payload = bytearray()
+    encode_varint(seq, payload)
+    encode_varint(base_seq, payload)
+    flags_offset = len(payload)
+    payload.append(0)
+    flags = 0
+    changed = [(i, row) for i, (old, row) in enumerate(zip(base["rows"], state["rows"]))
+               if old != row]
+    if changed:
+        flags |= DELTA_ROWS
+        payload.append(len(changed))
+        for i, row in changed:
+            payload += _ROW.pack(i, row)
+    held = state["held_shape"]
+    if held is not base["held_shape"]:
+        flags |= DELTA_HELD
+        payload.append(NO_PIECE if held is None else held.id)
+    if "bag_position" in state:
+        if state["bag_position"] != base.get("bag_position"):
+            flags |= DELTA_BAG
+            encode_varint(state["bag_position"], payload)
+    elif state["next_shapes"] != base.get("next_shapes"):
+        flags |= DELTA_NEXT
+        payload.append(len(state["next_shapes"]))
+        payload.extend(shape.id for shape in state["next_shapes"])
+    if state["score"] != base["score"]:
+        flags |= DELTA_SCORE
+        encode_varint(state["score"], payload)
+    if state["level"] != base["level"]:
+        flags |= DELTA_LEVEL
+        encode_varint(state["level"], payload)
+    if state.get("game_over", False) != base.get("game_over", False):
+        flags |= DELTA_GAME_OVER
+        payload.append(1 if state.get("game_over") else 0)
+    payload[flags_offset] = flags
+    return encode_message(MSG_DELTA, bytes(payload))
+
+
+def decode_delta(payload):
+    """(номер, номер базы, изменения) из данных MSG_DELTA.
+
+    Изменения - словарь с теми же ключами, что и состояние, но rows -
+    список пар (номер строки, значение). Строки, очки и уровень
+    проверяются так же, как в decode_state.
+    """
+    try:
+        seq, offset = decode_varint(payload, 0)
+        base_seq, offset = decode_varint(payload, offset)
+        flags = payload[offset]
+        offset += 1
+        changes = {}
+        if flags & DELTA_ROWS:
+            count = payload[offset]
+            offset += 1
+            changes["rows"] = [_ROW.unpack_from(payload, offset + i * _ROW.size)
+                               for i in range(count)]
+            offset += count * _ROW.size
+        if flags & DELTA_HELD:
+            held = payload[offset]
+            changes["held_shape"] = None if held == NO_PIECE else _piece(held)
+            offset += 1
+        if flags & DELTA_BAG:
+            changes["bag_position"], offset = decode_varint(payload, offset)
+        if flags & DELTA_NEXT:
+            length = payload[offset]
+            changes["next_shapes"] = [
+                _piece(piece_id) for piece_id in payload[offset + 1:offset + 1 + length]]
+            offset += 1 + length
+        if flags & DELTA_SCORE:
+            changes["score"], offset = decode_varint(payload, offset)
+        if flags & DELTA_LEVEL:
+            changes["level"], offset = decode_varint(payload, offset)
+        if flags & DELTA_GAME_OVER:
+            changes["game_over"] = bool(payload[offset])
+            offset += 1
+    except (IndexError, struct.error) as e:
+        raise ProtocolError(f"Поврежденная дельта: {e}") from None
+    for i, row in changes.get("rows", ()):
+        _check_row(i, row)
+    if "score" in changes:
+        _check_counter("очков", changes["score"])
+    if "level" in changes:
+        _check_counter("уровня", changes["level"])
+    return seq, base_seq, changes
+
+
+def apply_delta(base, changes):
+    """Новое состояние: base с примененными изменениями decode_delta."""
+    state = dict(base)
+    for key, value in changes.items():
+        if key != "rows":
+            state[key] = value
+    if "rows" in changes:
+        rows = list(base["rows"])
+        for i, row in changes["rows"]:
+            _check_row(i, row)
+            rows[i] = row
+        state["rows"] = rows
+    return state
+
+
+def check_bag_position(position, known=MIN_BAG_POSITION):
+    """Позиция в мешке из состояния соперника.
+
+    Получатель строит по ней очередь через PieceBag.at, который генерирует
+    все мешки до этой позиции, поэтому она не может быть меньше
+    MIN_BAG_POSITION и уходить дальше MAX_BAG_AHEAD от прошлой известной
+    позиции known.
+    """
+    if not MIN_BAG_POSITION <= position <= known + MAX_BAG_AHEAD:
+        raise ProtocolError(
+            f"Недопустимая позиция в мешке: {position} (прошлая {known})")
+
+
+def encode_ack(seq):
+    payload = bytearray()
+    encode_varint(seq, payload)
+    return encode_message(MSG_ACK, bytes(payload))
+
+
+def decode_ack(payload):
+    try:
+        return decode_varint(payload, 0)[0]
+    except IndexError:
+        raise ProtocolError("Поврежденное подтверждение") from None
+
+
+class StateEncoder:
+    """Отправитель потока состояний дельтами от подтвержденной базы.
+
+    База - последнее состояние, которое получатель подтвердил (ack). Если
+    подтверждения не нужны (например, сервер шлет клиенту по TCP, где
+    порядок и доставка гарантированы), с auto_ack=True базой сразу
+    становится отправленное состояние. Каждые keyframe_interval сообщений,
+    после resync и без базы отправляется ключевой кадр.
+    """
+
+    def __init__(self, keyframe_interval=KEYFRAME_INTERVAL, auto_ack=False):
+        self.keyframe_interval = keyframe_interval
+        self.auto_ack = auto_ack
+        self.seq = 0
+        self.base = None
+        self.base_seq = None
+        self.pending = {}  # Номер -> отправленное, но не подтвержденное состояние
+        self.since_keyframe = 0
+
+    def encode(self, state):
+        self.seq += 1
+        seq = self.seq
+        if len(self.pending) >= MAX_PENDING:
+            # Подтверждений давно нет: начинаем заново с ключевого кадра
+            self.pending.clear()
+            self.resync()
+        if self.base is None or self.since_keyframe >= self.keyframe_interval:
+            message = encode_state(state, seq)
+            self.since_keyframe = 0
+        else:
+            message = encode_delta(seq, self.base_seq, self.base, state)
+            self.since_keyframe += 1
+        if self.auto_ack:
+            self.base, self.base_seq = state, seq
+        else:
+            self.pending[seq] = state
+        return message
+
+    def ack(self, seq):
+        state = self.pending.get(seq)
+        if state is None:
+            return
+        self.base, self.base_seq = state, seq
+        for old in [key for key in self.pending if key <= seq]:
+            del self.pending[old]
+
+    def resync(self):
+        """Получатель потерял базу: следующим будет ключевой кадр."""
+        self.base = None
+        self.base_seq = None
+
+
+class StateDecoder:
+    """Получатель потока: помнит последние HISTORY_SIZE состояний по номерам.
+
+    Состояния проверяются (см. decode_state, apply_delta и
+    check_bag_position), неверное дает ProtocolError.
+    """
+
+    def __init__(self):
+        self.states = {}
+        self.last_seq = None
+        self.bag_position = MIN_BAG_POSITION  # Последняя принятая позиция в мешке
+
+    def decode(self, msg_type, payload):
+        """(номер, состояние) или None, если база дельты неизвестна (нужен resync)."""
+        if msg_type == MSG_STATE:
+            seq, state = decode_keyframe(payload)
+        else:
+            seq, base_seq, changes = decode_delta(payload)
+            base = self.states.get(base_seq)
+            if base is None:
+                return None
+            state = apply_delta(base, changes)
+        if "bag_position" in state:
+            check_bag_position(state["bag_position"], self.bag_position)
+            self.bag_position = state["bag_position"]
+        self.states[seq] = state
+        self.last_seq = seq
+        if len(self.states) > HISTORY_SIZE:
+            del self.states[min(self.states)]
+        return seq, state
+
+
+class SeqTracker:
+    """Номера состояний, которые помнит StateDecoder получателя, без самих состояний.
+
+    Сервер пересылает сообщения сопернику без перекодирования: StateDecoder
+    соперника получает тот же поток и знает ровно те же базы дельт. Данные
+    разбираются и проверяются так же, как у получателя (для проверки дельты
+    база не нужна), поэтому неверное состояние не доходит до соперника.
+    """
+
+    def __init__(self):
+        self.seqs = set()
+        self.bag_position = MIN_BAG_POSITION  # Последняя принятая позиция в мешке
+
+    def accept(self, msg_type, payload):
+        """Номер состояния или None, если база дельты неизвестна (нужен resync).
+
+        Неверное состояние дает ProtocolError.
+        """
+        if msg_type == MSG_STATE:
+            seq, state = decode_keyframe(payload)
+        else:
+            seq, base_seq, state = decode_delta(payload)
+            if base_seq not in self.seqs:
+                return None
+        if "bag_position" in state:
+            check_bag_position(state["bag_position"], self.bag_position)
+            self.bag_position = state["bag_position"]
+        self.seqs.add(seq)
+        if len(self.seqs) > HISTORY_SIZE:
+            self.seqs.remove(min(self.seqs))
+        return seq
+
+
+def recv_exact(sock, size):
+    """Ровно size байт из сокета или None, если соединение закрыто."""
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return bytes(data)
+
+
+def read_message(sock):
+    """Следующее сообщение (тип, данные, сообщение целиком) или None при закрытии."""
+    header = recv_exact(sock, HEADER.size)
+    if header is None:
+        return None
+    version, msg_type, length = HEADER.unpack(header)
+    if version != PROTOCOL_VERSION:
+        raise ProtocolError(f"Неподдерживаемая версия протокола: {version}")
+    payload = recv_exact(sock, length) if length else b""
+    if payload is None:
+        return None
+    return msg_type, payload, header + payload
+
+
+class MessageStream:
+    """Разбор сообщений из байт, приходящих кусками (asyncio.Protocol.data_received)."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        """Список (тип, данные, сообщение целиком) для всех пришедших сообщений."""
+        buffer = self.buffer
+        buffer += data
+        messages = []
+        offset = 0
+        while len(buffer) - offset >= HEADER.size:
+            version, msg_type, length = HEADER.unpack_from(buffer, offset)
+            if version != PROTOCOL_VERSION:
+                raise ProtocolError(f"Неподдерживаемая версия протокола: {version}")
+            end = offset + HEADER.size + length
+            if end > len(buffer):
+                break
+            message = bytes(buffer[offset:end])
+            messages.append((msg_type, message[HEADER.size:], message))
+            offset = end
+        if offset:
+            del buffer[:offset]
+        return messages
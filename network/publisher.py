@@ -0,0 +1,47 @@
+# publisher.py
+
+
+class StatePublisher:
+    """Отправка состояния игрока только при изменениях и не чаще max_rate в секунду.
+
+    Каждый кадр вызывается update(key, now_ms), где key - дешевый ключ
+    состояния (меняется при фиксации фигуры, очистке линий, удержании,
+    смене очков, уровня или конце игры). Без изменений ничего не
+    отправляется; изменения чаще лимита объединяются, и уходит последнее
+    состояние, когда лимит позволяет.
+    """
+
+    def __init__(self, send, get_state, max_rate=30):
+        self.send = send  # Отправка состояния, например BattleClient.send_data
+        self.get_state = get_state
+        self.interval_ms = 1000 / max_rate if max_rate else 0
+        self.key = None
+        self.dirty = False
+        self.last_sent_ms = None
+        self.sent = 0  # Отправлено сообщений
+        self.suppressed = 0  # Кадров без отправки: нет изменений или ждем лимит
+        self.coalesced = 0  # Изменений, вошедших в более позднее сообщение
+
+    def update(self, key, now_ms):
+        if key != self.key:
+            if self.dirty:
+                self.coalesced += 1
+            self.key = key
+            self.dirty = True
+        if not self.dirty or (self.last_sent_ms is not None and
+                              now_ms - self.last_sent_ms < self.interval_ms):
+            self.suppressed += 1
+            return False
+        self.flush(now_ms)
+        return True
+
+    def flush(self, now_ms):
+        """Немедленная отправка текущего состояния (например, в конце партии)."""
+        self.send(self.get_state())
+        self.dirty = False
+        self.last_sent_ms = now_ms
+        self.sent += 1
+
+    def stats(self):
+        return {"sent": self.sent, "suppressed": self.suppressed,
+                "coalesced": self.coalesced}
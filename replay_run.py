@@ -0,0 +1,85 @@
+import argparse
+import time
+
+from game.replay import Replay
+
+
+def verify(paths):
+    """Прогон записей без отрисовки и сверка итогов."""
+    failed = 0
+    steps = 0
+    start = time.perf_counter()
+    for path in paths:
+        replay = Replay.load(path)
+        ok, result = replay.verify()
+        steps += sum(run for run, _, _ in replay.events)
+        if not ok:
+            failed += 1
+            print(f"РАСХОЖДЕНИЕ {path}: ожидалось {replay.final}, получено {result}")
+        replay.close()
+    elapsed = time.perf_counter() - start
+    print(f"Проверено записей: {len(paths)}, расхождений: {failed}, "
+          f"{steps} шагов за {elapsed:.2f} с")
+    return failed == 0
+
+
+def dump_index(path):
+    replay = Replay.load(path)
+    print(f"{path}: seed {replay.seed}, ключевой кадр каждые "
+          f"{replay.keyframe_interval} фигур, кадров {len(replay.index)}")
+    print(f"{'время, мс':>10}{'фигур':>8}{'шаг':>10}{'смещение':>10}")
+    for entry in replay.index:
+        print(f"{entry.time_ms:>10}{entry.pieces:>8}{entry.step:>10}{entry.offset:>10}")
+    replay.close()
+
+
+def verify_index(paths):
+    """Сверка ключевых кадров с прогоном каждой записи с начала."""
+    failed = 0
+    for path in paths:
+        replay = Replay.load(path)
+        mismatched = replay.verify_index()
+        if mismatched:
+            failed += 1
+            print(f"РАСХОЖДЕНИЕ {path}: не совпали кадры "
+                  f"{[entry.pieces if entry else None for entry in mismatched]}")
+        replay.close()
+    print(f"Проверено индексов: {len(paths)}, расхождений: {failed}")
+    return failed == 0
+
+
+def play(path, speed):
+    import pygame
+
+    from game.constants import SCREEN_WIDTH, SCREEN_HEIGHT
+    from game.tetris_game import TetrisGame
+
+    replay = Replay.load(path)
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Tetris - запись")
+    game = replay.create_engine(TetrisGame)
+    game.play_replay(screen, replay, speed)
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Проверка и просмотр записей партий.")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--play", action="store_true",
+                        help="показать первую запись в реальном времени")
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--index", action="store_true",
+                        help="вывести индекс ключевых кадров")
+    parser.add_argument("--verify-index", action="store_true",
+                        help="сверить ключевые кадры с прогоном с начала")
+    args = parser.parse_args()
+    if args.play:
+        play(args.paths[0], args.speed)
+    elif args.index:
+        for path in args.paths:
+            dump_index(path)
+    elif args.verify_index:
+        raise SystemExit(0 if verify_index(args.paths) else 1)
+    else:
+        raise SystemExit(0 if verify(args.paths) else 1)
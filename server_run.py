@@ -1,5 +1,11 @@
+import argparse
+
 from network.battle_server import BattleServer
 
 if __name__ == "__main__":
-    server = BattleServer(host="127.0.0.1", port=5555)
+    parser = argparse.ArgumentParser(description="Сервер сражений.")
+    parser.add_argument("--authoritative", action="store_true",
+                        help="игру ведет сервер, клиенты шлют только входы")
+    args = parser.parse_args()
+    server = BattleServer(host="127.0.0.1", port=5555, authoritative=args.authoritative)
     server.start()
\ No newline at end of file
@@ -0,0 +1,40 @@
+import argparse
+import json
+
+from game.tournament import run_tournament
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Безголовый турнир ИИ на всех ядрах процессора.")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--mode", choices=("survival", "battle"),
+                        default="survival")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed первой партии, у следующих seed + номер")
+    parser.add_argument("--max-pieces", type=int, default=1000)
+    parser.add_argument("--dt", type=int, default=16,
+                        help="длительность шага симуляции, мс")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default=None,
+                        help="файл результатов .csv или .jsonl")
+    parser.add_argument("--lookahead", action="store_true")
+    parser.add_argument("--weights-a", type=json.loads, default=None,
+                        help='веса ИИ игрока 0, например {"holes": -0.5, ...}')
+    parser.add_argument("--weights-b", type=json.loads, default=None,
+                        help="веса ИИ игрока 1 в режиме battle")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    run_tournament(
+        args.games,
+        mode=args.mode,
+        seed=args.seed,
+        max_pieces=args.max_pieces,
+        dt_ms=args.dt,
+        weights=(args.weights_a, args.weights_b),
+        lookahead=args.lookahead,
+        workers=args.workers,
+        output=args.output)
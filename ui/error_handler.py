@@ -2,13 +2,13 @@
 import pygame
 
 from game.constants import BLACK, WHITE, SCREEN_WIDTH, SCREEN_HEIGHT
+from game.text import render_text
 
 
 def show_error_message(message, screen):
     """Функция для отображения сообщения об ошибке."""
     screen.fill(BLACK)
-    font = pygame.font.Font(None, 36)
-    error_text = font.render(message, True, WHITE)
+    error_text = render_text(message, 36)
     screen.blit(
         error_text,
         (SCREEN_WIDTH //
@@ -3,6 +3,7 @@
 import pygame
 
 from game.constants import *
+from game.text import get_font
 
 
 class InputBox:
@@ -10,7 +11,7 @@ class InputBox:
         self.rect = pygame.Rect(x, y, w, h)
         self.color = GRAY
         self.text = text
-        self.font = pygame.font.Font(None, 36)
+        self.font = get_font(36)
         self.txt_surface = self.font.render(text, True, self.color)
         self.active = False
         self.allowed_chars = allowed_chars  # Список разрешенных символов
@@ -6,6 +6,8 @@ from .input_box import InputBox
 
 from game.constants import *
 from game.settings import global_settings
+from game.text import render_text
+from game.ui_loop import CONTINUE, run_ui_loop
 
 
 def show_settings_menu(screen):
@@ -34,28 +36,27 @@ def show_settings_menu(screen):
         200,
         40)
 
-    while True:
+    # Текстовые пояснения для каждого InputBox
+    explanations = [
+        "Начальная задержка по горизонтали (мс):",
+        "Ускоренная задержка по горизонтали (мс):",
+        "Начальная задержка по вертикали (мс):",
+        "Ускоренная задержка по вертикали (мс):",
+        "Порог ускорения (мс):"
+    ]
+
+    def draw(screen):
         screen.fill(BLACK)
-        font = pygame.font.Font(None, 36)
 
         # Заголовок настроек
-        settings_title_text = font.render("Настройки", True, WHITE)
+        settings_title_text = render_text("Настройки", 36)
         screen.blit(settings_title_text,
                     (settings_title_text.get_width() // 2, SCREEN_HEIGHT // 8))
 
-        # Текстовые пояснения для каждого InputBox
-        explanations = [
-            "Начальная задержка по горизонтали (мс):",
-            "Ускоренная задержка по горизонтали (мс):",
-            "Начальная задержка по вертикали (мс):",
-            "Ускоренная задержка по вертикали (мс):",
-            "Порог ускорения (мс):"
-        ]
-
         # Рисуем пояснения для InputBox
         for i, box in enumerate(input_boxes):
             # Рисуем пояснительный текст
-            explanation_text = font.render(explanations[i], True, WHITE)
+            explanation_text = render_text(explanations[i], 36)
             screen.blit(
                 explanation_text,
                 (SCREEN_WIDTH // 2 - 250,
@@ -66,19 +67,25 @@ def show_settings_menu(screen):
 
         # Кнопка "Назад"
         pygame.draw.rect(screen, GRAY, back_button_rect)
-        back_text = font.render("Назад", True, WHITE)
+        back_text = render_text("Назад", 36)
         screen.blit(
             back_text,
             (back_button_rect.x + 70,
              back_button_rect.y + 10))
 
-        # Обработка наведения мыши на кнопку "Назад"
-        mouse_pos = pygame.mouse.get_pos()
-        mouse_clicked = pygame.mouse.get_pressed()[0]
-
-        if back_button_rect.collidepoint(mouse_pos):
+        # Подсветка кнопки "Назад" при наведении
+        if back_button_rect.collidepoint(pygame.mouse.get_pos()):
             pygame.draw.rect(screen, WHITE, back_button_rect, 2)
-            if mouse_clicked:
+
+    def handle_event(event):
+        if event.type == pygame.QUIT:
+            return True
+
+        for box in input_boxes:
+            box.handle_event(event)
+
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            if back_button_rect.collidepoint(event.pos):
                 # Обновляем глобальные настройки новыми значениями
                 global_settings["initial_move_delay_horizontal"] = int(
                     input_boxes[0].text)
@@ -90,37 +97,15 @@ def show_settings_menu(screen):
                     input_boxes[3].text)
                 global_settings["acceleration_threshold"] = int(
                     input_boxes[4].text)
-                return None  # Возврат в главное меню
-
-        # Обработка событий
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                return True
-
-            for box in input_boxes:
-                box.handle_event(event)
 
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if back_button_rect.collidepoint(event.pos):
-                    # Обновляем глобальные настройки новыми значениями
-                    global_settings["initial_move_delay_horizontal"] = int(
-                        input_boxes[0].text)
-                    global_settings["accelerated_move_delay_horizontal"] = int(
-                        input_boxes[1].text)
-                    global_settings["initial_move_delay_vertical"] = int(
-                        input_boxes[2].text)
-                    global_settings["accelerated_move_delay_vertical"] = int(
-                        input_boxes[3].text)
-                    global_settings["acceleration_threshold"] = int(
-                        input_boxes[4].text)
-
-                    return None  # Возврат в главное меню
+                return None  # Возврат в главное меню
 
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    return None  # Возврат в главное меню
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_ESCAPE:
+                return None  # Возврат в главное меню
+        return CONTINUE
 
-        pygame.display.flip()
+    return run_ui_loop(screen, draw, handle_event)
 
 
 def show_battle_connection_menu(screen):
@@ -142,12 +127,11 @@ def show_battle_connection_menu(screen):
     connect_button_rect = pygame.Rect(
         SCREEN_WIDTH // 2 - 100, SCREEN_HEIGHT // 2 + 150, 200, 40)
 
-    while True:
+    def draw(screen):
         screen.fill(BLACK)
-        font = pygame.font.Font(None, 36)
 
         # Заголовок
-        title_text = font.render("Подключение к серверу", True, WHITE)
+        title_text = render_text("Подключение к серверу", 36)
         screen.blit(
             title_text,
             (SCREEN_WIDTH //
@@ -159,8 +143,8 @@ def show_battle_connection_menu(screen):
              150))
 
         # Подписи для InputBox
-        ip_label = font.render("IP-адрес:", True, WHITE)
-        port_label = font.render("Порт:", True, WHITE)
+        ip_label = render_text("IP-адрес:", 36)
+        port_label = render_text("Порт:", 36)
         screen.blit(
             ip_label,
             (SCREEN_WIDTH // 2 - 250,
@@ -176,19 +160,25 @@ def show_battle_connection_menu(screen):
 
         # Кнопка "Подключиться"
         pygame.draw.rect(screen, GRAY, connect_button_rect)
-        connect_text = font.render("Подключиться", True, WHITE)
+        connect_text = render_text("Подключиться", 36)
         screen.blit(
             connect_text,
             (connect_button_rect.x + 20,
              connect_button_rect.y + 10))
 
-        # Обработка наведения мыши на кнопку "Подключиться"
-        mouse_pos = pygame.mouse.get_pos()
-        mouse_clicked = pygame.mouse.get_pressed()[0]
-
-        if connect_button_rect.collidepoint(mouse_pos):
+        # Подсветка кнопки "Подключиться" при наведении
+        if connect_button_rect.collidepoint(pygame.mouse.get_pos()):
             pygame.draw.rect(screen, WHITE, connect_button_rect, 2)
-            if mouse_clicked:
+
+    def handle_event(event):
+        if event.type == pygame.QUIT:
+            return "quit"  # Выход из меню
+
+        ip_input.handle_event(event)
+        port_input.handle_event(event)
+
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            if connect_button_rect.collidepoint(event.pos):
                 # Возвращаем введенные данные
                 try:
                     return ip_input.text, int(port_input.text)
@@ -196,35 +186,33 @@ def show_battle_connection_menu(screen):
                     print('UnexpectedError: Порт пуст/порт состоит из букв ')
                     return '127.0.0.1', 5555
 
-        # Обработка событий
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                return "quit"  # Выход из меню
-
-            ip_input.handle_event(event)
-            port_input.handle_event(event)
-
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    return None, None  # Выход из меню
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_ESCAPE:
+                return None, None  # Выход из меню
+        return CONTINUE
 
-        pygame.display.flip()
+    return run_ui_loop(screen, draw, handle_event)
 
 # Главное меню
 
 
 def show_menu(screen):
-    while True:
+    # Кнопки меню: (надпись, результат, смещение по вертикали от центра)
+    buttons = [
+        ("Сражение", "battle", -100),  # Запуск режима сражения
+        ("Одиночная игра", "single_player", 0),  # Начать одиночную игру
+        ("Настройки", "settings", 100),  # Перейти в меню настроек
+    ]
+    button_rects = []
+    for text, _, dy in buttons:
+        surface = render_text(text, 72)
+        button_rects.append(surface.get_rect(
+            topleft=(SCREEN_WIDTH // 2 - surface.get_width() // 2,
+                     SCREEN_HEIGHT // 2 + dy)))
+
+    def draw(screen):
         screen.fill(BLACK)
-        font = pygame.font.Font(None, 72)
-        title_text = font.render("Тетрис", True, WHITE)
-        battle_text = font.render(
-            "Сражение", True, WHITE)  # Новая кнопка "Сражение"
-        single_player_text = font.render(
-            "Одиночная игра", True, WHITE)  # Переименованная кнопка
-        settings_text = font.render("Настройки", True, WHITE)
-
-        # Отображение текста на экране
+        title_text = render_text("Тетрис", 72)
         screen.blit(
             title_text,
             (SCREEN_WIDTH //
@@ -234,101 +222,23 @@ def show_menu(screen):
              SCREEN_HEIGHT //
              2 -
              200))
-        screen.blit(
-            battle_text,
-            (SCREEN_WIDTH //
-             2 -
-             battle_text.get_width() //
-             2,
-             SCREEN_HEIGHT //
-             2 -
-             100))  # Новая кнопка
-        screen.blit(
-            single_player_text,
-            (SCREEN_WIDTH //
-             2 -
-             single_player_text.get_width() //
-             2,
-             SCREEN_HEIGHT //
-             2))  # Переименованная кнопка
-        screen.blit(
-            settings_text,
-            (SCREEN_WIDTH //
-             2 -
-             settings_text.get_width() //
-             2,
-             SCREEN_HEIGHT //
-             2 +
-             100))
 
+        # Кнопки, подсвеченные при наведении
         mouse_pos = pygame.mouse.get_pos()
-        mouse_clicked = pygame.mouse.get_pressed()[0]
-
-        # Определяем прямоугольники кнопок
-        battle_button_rect = pygame.Rect(
-            SCREEN_WIDTH // 2 - battle_text.get_width() // 2,
-            SCREEN_HEIGHT // 2 - 100,
-            battle_text.get_width(),
-            battle_text.get_height())
-        single_player_button_rect = pygame.Rect(
-            SCREEN_WIDTH // 2 - single_player_text.get_width() // 2,
-            SCREEN_HEIGHT // 2,
-            single_player_text.get_width(),
-            single_player_text.get_height())
-        settings_button_rect = pygame.Rect(
-            SCREEN_WIDTH // 2 - settings_text.get_width() // 2,
-            SCREEN_HEIGHT // 2 + 100,
-            settings_text.get_width(),
-            settings_text.get_height())
-
-        # Подсветка кнопок при наведении
-        if battle_button_rect.collidepoint(mouse_pos):
-            battle_text = font.render("Сражение", True, GRAY)
-            screen.blit(
-                battle_text,
-                (SCREEN_WIDTH //
-                 2 -
-                 battle_text.get_width() //
-                 2,
-                 SCREEN_HEIGHT //
-                 2 -
-                 100))
-            if mouse_clicked:
-                return "battle"  # Возвращаем "battle" для запуска режима сражения
-
-        if single_player_button_rect.collidepoint(mouse_pos):
-            single_player_text = font.render("Одиночная игра", True, GRAY)
-            screen.blit(
-                single_player_text,
-                (SCREEN_WIDTH //
-                 2 -
-                 single_player_text.get_width() //
-                 2,
-                 SCREEN_HEIGHT //
-                 2))
-            if mouse_clicked:
-                return "single_player"  # Начать одиночную игру
-
-        if settings_button_rect.collidepoint(mouse_pos):
-            settings_text = font.render("Настройки", True, GRAY)
-            screen.blit(
-                settings_text,
-                (SCREEN_WIDTH //
-                 2 -
-                 settings_text.get_width() //
-                 2,
-                 SCREEN_HEIGHT //
-                 2 +
-                 100))
-            if mouse_clicked:
-                return "settings"  # Перейти в меню настроек
-
-        pygame.display.flip()
-
-        # Обработка событий
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                return "quit"  # Выход из игры
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_RETURN:
-                    return None  # Начать одиночную игру
+        for (text, _, _), rect in zip(buttons, button_rects):
+            color = GRAY if rect.collidepoint(mouse_pos) else WHITE
+            screen.blit(render_text(text, 72, color), rect)
+
+    def handle_event(event):
+        if event.type == pygame.QUIT:
+            return "quit"  # Выход из игры
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_RETURN:
+                return None  # Начать одиночную игру
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            for (_, result, _), rect in zip(buttons, button_rects):
+                if rect.collidepoint(event.pos):
+                    return result
+        return CONTINUE
+
+    return run_ui_loop(screen, draw, handle_event)